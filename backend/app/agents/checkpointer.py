@@ -1,14 +1,96 @@
 """Checkpointer for LangGraph state persistence."""
+from typing import Any, Dict
+
 from langgraph.checkpoint.memory import MemorySaver
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
+from app.models.protocol import Protocol
+
+# Protocol columns mirrored from workflow state by the checkpointer
+_PERSISTED_FIELDS = ("current_draft", "safety_score", "empathy_metrics", "iteration_count", "status", "next_agent")
+
+# Statuses that mean the workflow is done and buffered writes must hit the DB
+_TERMINAL_STATUSES = ("awaiting_approval", "approved", "rejected")
+
+# Statuses a deferred flush is allowed to overwrite. Terminal statuses are
+# committed outside the checkpointer too (reject/halt API routes, the
+# recursion-limit handler), and a buffered "reviewing" must never revert them.
+_ACTIVE_STATUSES = ("drafting", "reviewing")
 
-def create_checkpointer(db: Session, protocol_id: str) -> MemorySaver:
-    """Create a memory checkpointer for a protocol.
-    
-    Note: We use MemorySaver for LangGraph compatibility. Database persistence
-    is handled directly in the agent nodes when they update the protocol.
+
+class DatabaseCheckpointer(MemorySaver):
+    """Checkpointer that buffers protocol writes and flushes them in one UPDATE.
+
+    LangGraph calls put() after every super-step; committing to the database on
+    each call costs a full round-trip per node. In "end_of_workflow" mode (the
+    default) state deltas are buffered in memory and written out in a single
+    UPDATE when the workflow reaches a terminal status or when flush() is
+    called explicitly (e.g. from the workflow runner's finally block). Pass
+    checkpoint_mode="per_step" to restore the old write-through behavior.
     """
-    # Use a simple MemorySaver - database persistence happens in nodes
-    return MemorySaver()
 
+    def __init__(self, db: Session, protocol_id: str, checkpoint_mode: str = "end_of_workflow"):
+        super().__init__()
+        self.db = db
+        self.protocol_id = protocol_id
+        self.checkpoint_mode = checkpoint_mode
+        self._pending: Dict[str, Any] = {}
+        self._last_written: Dict[str, Any] = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        """Buffer state deltas instead of hitting the database per super-step."""
+        channel_values = checkpoint.get("channel_values") or {}
+        # LangGraph lists only the channels updated this super-step in
+        # new_versions, so restrict the scan to those instead of comparing
+        # every persisted field; the value comparison stays as a second
+        # filter because a channel can be rewritten with an equal value
+        if new_versions:
+            changed_fields = [f for f in _PERSISTED_FIELDS if f in new_versions]
+        else:
+            changed_fields = list(_PERSISTED_FIELDS)
+        for field in changed_fields:
+            value = channel_values.get(field)
+            if value is not None and value != self._last_written.get(field):
+                self._pending[field] = value
+
+        result = super().put(config, checkpoint, metadata, new_versions)
+
+        # Flush immediately on terminal states (or always in per_step mode)
+        if self.checkpoint_mode != "end_of_workflow" or self._pending.get("status") in _TERMINAL_STATUSES:
+            self.flush()
+
+        return result
+
+    def flush(self) -> None:
+        """Write all buffered state fields to the protocol row in one UPDATE.
+
+        Unless the buffered status is itself terminal, the UPDATE is guarded
+        on the row still being in an active status: the runner's finally-block
+        flush can race a terminal status committed elsewhere (the reject API,
+        the recursion-limit handler), and writing stale buffered state over it
+        would put the protocol back in the startup-resume path.
+        """
+        if not self._pending:
+            return
+        stmt = (
+            update(Protocol)
+            .where(Protocol.id == self.protocol_id)
+            .values(**self._pending)
+        )
+        if self._pending.get("status") not in _TERMINAL_STATUSES:
+            stmt = stmt.where(Protocol.status.in_(_ACTIVE_STATUSES))
+        self.db.execute(stmt)
+        self.db.commit()
+        self._last_written.update(self._pending)
+        self._pending = {}
+
+
+def create_checkpointer(db: Session, protocol_id: str, checkpoint_mode: str = "end_of_workflow") -> MemorySaver:
+    """Create a checkpointer for a protocol.
+
+    Note: We subclass MemorySaver for LangGraph compatibility. Database
+    persistence is buffered and flushed at the end of the workflow; the agent
+    nodes still write their own canonical updates when they run.
+    """
+    return DatabaseCheckpointer(db, protocol_id, checkpoint_mode=checkpoint_mode)
@@ -1,11 +1,19 @@
 """LangGraph workflow definition for the multi-agent protocol generation system."""
-import sys
-import traceback
-from concurrent.futures import ThreadPoolExecutor
-from typing import Literal
+import asyncio
+import atexit
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import lru_cache
+from langgraph.cache.memory import InMemoryCache
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
+from langgraph.types import CachePolicy
+from sqlalchemy import update as sa_update
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.agents.state import ProtocolState
 from app.agents.nodes import (
     supervisor_node,
@@ -15,23 +23,85 @@ from app.agents.nodes import (
     halt_node,
     finalize_node,
     save_agent_thought,
+    flush_thoughts,
 )
 from app.agents.checkpointer import create_checkpointer
-from app.database import SessionLocal
+from app.database import SessionLocal, WorkflowSession
 from app.models.protocol import Protocol
+from app.utils.complexity import classify_intent_complexity
 
+# Lazy %s formatting keeps message construction off the hot event loop when
+# DEBUG is disabled; handlers write to stderr so MCP's stdout JSON-RPC channel
+# stays clean (configured in app.main)
+logger = logging.getLogger(__name__)
 
-def route_next_agent(state: ProtocolState) -> Literal["drafter", "safety_guardian", "clinical_critic", "halt", "finalize", "finish"]:
-    """Route to the next agent based on supervisor decision."""
+# Shared executor for background workflow runs. Creating a fresh
+# ThreadPoolExecutor per workflow leaks one worker thread per protocol run;
+# a single module-level pool reuses threads and bounds concurrency.
+_WORKFLOW_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.WORKFLOW_POOL_SIZE,
+    thread_name_prefix="protocol-wf",
+)
+atexit.register(_WORKFLOW_EXECUTOR.shutdown, wait=False)
+
+
+def submit_background(fn) -> Future:
+    """Run a callable on the shared workflow pool instead of a one-off thread."""
+    return _WORKFLOW_EXECUTOR.submit(fn)
+
+# Cancellation events keyed by protocol_id. Status-changing API routes set
+# these so running workflow threads notice without polling the database on
+# every super-step.
+_cancellation_events: dict = {}
+_cancellation_lock = threading.Lock()
+
+# In-flight workflow futures keyed by submission fingerprint. Frontend retries
+# can submit the same protocol several times in quick succession; returning
+# the existing future instead of spawning another run avoids duplicated LLM
+# calls racing on the same rows.
+_inflight_workflows: "dict[str, Future]" = {}
+_inflight_lock = threading.Lock()
+
+
+def _workflow_fingerprint(protocol_id: str, intent: str, protocol_type: str) -> str:
+    """Fingerprint a workflow submission for in-flight deduplication."""
+    raw = f"{protocol_id}|{intent}|{protocol_type}".encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def get_cancellation_event(protocol_id: str) -> threading.Event:
+    """Get (or create) the cancellation event for a protocol."""
+    with _cancellation_lock:
+        return _cancellation_events.setdefault(protocol_id, threading.Event())
+
+
+def signal_status_change(protocol_id: str) -> None:
+    """Wake the workflow thread for a protocol after an external status change."""
+    with _cancellation_lock:
+        event = _cancellation_events.get(protocol_id)
+    if event:
+        event.set()
+
+
+def route_next_agent(state: ProtocolState):
+    """Route to the next agent (or agents, for the review fan-out)."""
     next_agent = state.get("next_agent", "finish")
-    
+
+    # Fan out: both reviewers read only current_draft and return disjoint
+    # state keys, so they run in the same super-step and the supervisor joins
+    # on their partial updates — two LLM calls in parallel instead of serial
+    if next_agent == "review":
+        return ["safety_guardian", "clinical_critic"]
+
     # Validate that next_agent is a valid routing destination
     # If somehow "supervisor" or invalid value is set, log and route to finish
     valid_destinations = ["drafter", "safety_guardian", "clinical_critic", "halt", "finalize", "finish"]
     if next_agent not in valid_destinations:
         # Log the invalid routing attempt - this shouldn't happen if supervisor works correctly
-        import sys
-        sys.stderr.write(f"WARNING: Invalid next_agent value '{next_agent}' from state, defaulting to 'finish'. State keys: {list(state.keys())}\n")
+        logger.warning(
+            "Invalid next_agent value '%s' from state, defaulting to 'finish'. State keys: %s",
+            next_agent, list(state.keys()),
+        )
         # Ensure status is set before finishing
         if "status" in state and state["status"] not in ["awaiting_approval", "approved", "rejected"]:
             state["status"] = "awaiting_approval"
@@ -40,25 +110,91 @@ def route_next_agent(state: ProtocolState) -> Literal["drafter", "safety_guardia
     return next_agent
 
 
-def create_protocol_workflow(db: Session, protocol_id: str):
-    """Create and configure the LangGraph workflow for a protocol."""
-    # Create checkpointer
-    checkpointer = create_checkpointer(db, protocol_id)
-    
-    # Create graph
+# Session for the workflow run on the current thread. The graph topology is
+# identical for every protocol, so nodes read their session from here instead
+# of closing over a db argument — that lets _build_workflow_graph be built
+# once and reused. LangGraph runs nodes on context-propagating executors, so
+# the value set in run_sync is visible inside the nodes.
+_workflow_db: ContextVar[Session] = ContextVar("workflow_db")
+
+
+def _with_workflow_session(node_fn):
+    """Run a node on the workflow thread's session, batch-flushing thoughts.
+
+    Agent thoughts are buffered per session (see save_agent_thought) and
+    written out in one commit when the node finishes rather than one commit
+    per thought.
+    """
+    def run(state):
+        db = _workflow_db.get()
+        try:
+            return node_fn(state, db)
+        finally:
+            flush_thoughts(db)
+    return run
+
+
+def _with_own_session(node_fn):
+    """Wrap a node that may run in a parallel super-step with its own session.
+
+    The two reviewer nodes can execute concurrently after a review fan-out;
+    sharing the workflow thread's session across those executor threads is not
+    safe, so each run gets a short-lived session of its own. Buffered thoughts
+    are flushed before the session closes.
+    """
+    def run(state):
+        db = SessionLocal()
+        try:
+            return node_fn(state, db)
+        finally:
+            flush_thoughts(db)
+            db.close()
+    return run
+
+
+# Shared node-level cache for the reviewer nodes (used at compile time below)
+_NODE_CACHE = InMemoryCache()
+
+
+def _review_cache_key(state: dict) -> str:
+    """Cache key for reviewer nodes: salient inputs only.
+
+    LangGraph's default key pickles the whole state, so bookkeeping fields
+    (agent_notes, iteration_count, revision_reasons, last/next_agent) that
+    change every super-step would defeat every hit. The reviewers only read
+    current_draft, so key on that plus the protocol identity; protocol_id is
+    included so a hit never suppresses another protocol's first review (visit
+    counts and audit thoughts are written per protocol).
+    """
+    return str(hash((
+        state.get("protocol_id"),
+        state.get("current_draft"),
+        state.get("protocol_type"),
+        state.get("intent"),
+    )))
+
+
+_REVIEW_CACHE_POLICY = CachePolicy(key_func=_review_cache_key)
+
+
+@lru_cache(maxsize=1)
+def _build_workflow_graph() -> StateGraph:
+    """Build the protocol StateGraph topology (nodes and edges) once."""
     workflow = StateGraph(ProtocolState)
-    
-    # Add nodes
-    workflow.add_node("supervisor", lambda state: supervisor_node(state, db))
-    workflow.add_node("drafter", lambda state: drafter_node(state, db))
-    workflow.add_node("safety_guardian", lambda state: safety_guardian_node(state, db))
-    workflow.add_node("clinical_critic", lambda state: clinical_critic_node(state, db))
-    workflow.add_node("halt", lambda state: halt_node(state, db))
-    workflow.add_node("finalize", lambda state: finalize_node(state, db))
-    
+
+    # Add nodes. Reviewer nodes get a cache policy: a re-review of an
+    # unchanged draft replays the previous partial update instead of running
+    # the node (and its LLM call) again.
+    workflow.add_node("supervisor", _with_workflow_session(supervisor_node))
+    workflow.add_node("drafter", _with_workflow_session(drafter_node))
+    workflow.add_node("safety_guardian", _with_own_session(safety_guardian_node), cache_policy=_REVIEW_CACHE_POLICY)
+    workflow.add_node("clinical_critic", _with_own_session(clinical_critic_node), cache_policy=_REVIEW_CACHE_POLICY)
+    workflow.add_node("halt", _with_workflow_session(halt_node))
+    workflow.add_node("finalize", _with_workflow_session(finalize_node))
+
     # Set entry point
     workflow.set_entry_point("supervisor")
-    
+
     # Add conditional edges from supervisor
     workflow.add_conditional_edges(
         "supervisor",
@@ -72,46 +208,79 @@ def create_protocol_workflow(db: Session, protocol_id: str):
             "finish": END,
         }
     )
-    
+
     # All agents return to supervisor
     workflow.add_edge("drafter", "supervisor")
     workflow.add_edge("safety_guardian", "supervisor")
     workflow.add_edge("clinical_critic", "supervisor")
     workflow.add_edge("halt", END)
     workflow.add_edge("finalize", END)
-    
-    # Compile with checkpointer
-    app = workflow.compile(checkpointer=checkpointer)
-    
-    return app
+
+    return workflow
+
+
+def create_protocol_workflow(db: Session, protocol_id: str):
+    """Create and configure the LangGraph workflow for a protocol.
+
+    Returns the compiled app together with its checkpointer so callers can
+    flush buffered writes without constructing a second checkpointer. Only the
+    checkpointer is per-protocol; the graph itself comes from the shared
+    cached topology.
+    """
+    checkpointer = create_checkpointer(db, protocol_id)
+    app = _build_workflow_graph().compile(checkpointer=checkpointer, cache=_NODE_CACHE)
+
+    return app, checkpointer
+
+
+def _workflow_finished(checkpointer, config) -> bool:
+    """True when the merged workflow state has reached a terminal routing.
+
+    Reads the channel values straight off the checkpointer - an in-memory
+    lookup - instead of scanning each node's partial update dict per event or
+    going through graph.get_state, which rebuilds a full StateSnapshot.
+    """
+    tup = checkpointer.get_tuple(config)
+    if tup is None:
+        return False
+    channel_values = tup.checkpoint.get("channel_values") or {}
+    return (channel_values.get("next_agent") == "finish"
+            or channel_values.get("status") == "awaiting_approval")
 
 
 def run_protocol_workflow(db: Session, protocol_id: str, intent: str, protocol_type: str):
     """Run the protocol generation workflow asynchronously."""
-    # Get protocol
-    protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
-    if not protocol:
+    # Fetch only the thread_id; run_sync loads the full row in its own session
+    row = db.query(Protocol.thread_id).filter(Protocol.id == protocol_id).first()
+    if not row:
         raise ValueError(f"Protocol {protocol_id} not found")
-    
+
     # Create config for this thread
     config = {
         "configurable": {
-            "thread_id": protocol.thread_id or protocol_id,
+            "thread_id": row.thread_id or protocol_id,
         }
     }
     
     # Run workflow in thread pool (since LangGraph can be blocking)
     def run_sync():
-        # Create a new database session for this thread
-        thread_db = SessionLocal()
+        # Thread-scoped session: reuses the worker thread's connection across
+        # runs; removed (not just closed) in finally so no state carries over
+        thread_db = WorkflowSession()
+        app = None
+        checkpointer = None
+        cancel_event = get_cancellation_event(protocol_id)
+        cancel_event.clear()
+        # Nodes in the cached graph resolve their session from this ContextVar
+        _workflow_db.set(thread_db)
         try:
             # Get fresh protocol instance in this thread's session
-            thread_protocol = thread_db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            thread_protocol = thread_db.get(Protocol, protocol_id)
             if not thread_protocol:
                 raise ValueError(f"Protocol {protocol_id} not found in background thread")
             
             # Create workflow (checkpointer is created inside)
-            app = create_protocol_workflow(thread_db, protocol_id)
+            app, checkpointer = create_protocol_workflow(thread_db, protocol_id)
             
             # Load current state from database to sync with workflow
             # This ensures we don't lose progress and have latest metrics
@@ -128,12 +297,17 @@ def run_protocol_workflow(db: Session, protocol_id: str, intent: str, protocol_t
                 "agent_notes": [],
                 "iteration_count": thread_protocol.iteration_count or 0,
                 "status": current_status,
-                "next_agent": "drafter",  # Start with drafter, not supervisor (supervisor is entry point)
+                # Resume from the last persisted routing decision; fall back to
+                # drafter for new protocols (supervisor is the entry point)
+                "next_agent": thread_protocol.next_agent or "drafter",
                 "needs_revision": False,
                 "is_approved": current_status == "approved",
                 "should_halt": current_status == "awaiting_approval",
                 "last_agent": "",
                 "revision_reasons": [],
+                "fast_path": classify_intent_complexity(
+                    thread_protocol.intent, thread_protocol.protocol_type
+                ) == "simple",
             }
             save_agent_thought(
                 thread_db, protocol_id, "supervisor", "Supervisor",
@@ -141,123 +315,160 @@ def run_protocol_workflow(db: Session, protocol_id: str, intent: str, protocol_t
                 "action"
             )
             
-            # Save initial thought and update status BEFORE starting workflow
-            # Use stderr for logging to avoid breaking MCP JSON protocol (stdout is for JSON-RPC)
-            sys.stderr.write(f"Starting workflow for protocol {protocol_id}\n")
+            # Save initial thought and update status BEFORE starting workflow;
+            # flush_thoughts commits the buffered thought and the status change
+            # together
+            logger.info("Starting workflow for protocol %s", protocol_id)
             thread_protocol.status = "reviewing"
-            thread_db.commit()
-            
+            flush_thoughts(thread_db)
+
             # Start the workflow stream with recursion limit
-            sys.stderr.write(f"Beginning workflow stream for protocol {protocol_id}\n")
+            logger.debug("Beginning workflow stream for protocol %s", protocol_id)
             event_count = 0
             # Add recursion limit to prevent infinite loops
             config_with_limit = {
                 **config,
                 "recursion_limit": 200,  # Increased to handle longer workflows
             }
-            stream = app.stream(state, config_with_limit)
+            # Pin updates mode explicitly: per-event payloads carry only the
+            # fields each node changed, not a full ProtocolState (which
+            # includes the whole draft text) per super-step
+            stream = app.stream(state, config_with_limit, stream_mode="updates")
             
             # Check if stream is empty
             first_event = None
             try:
                 first_event = next(stream)
                 event_count += 1
-                sys.stderr.write(f"Workflow event {event_count} for protocol {protocol_id}: {list(first_event.keys())}\n")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Workflow event %s for protocol %s: %s", event_count, protocol_id, list(first_event.keys()))
             except StopIteration:
-                sys.stderr.write(f"WARNING: Workflow stream is empty for protocol {protocol_id}\n")
+                logger.warning("Workflow stream is empty for protocol %s", protocol_id)
                 raise ValueError("Workflow stream produced no events")
             
             # Process remaining events
             for event in stream:
                 event_count += 1
-                sys.stderr.write(f"Workflow event {event_count} for protocol {protocol_id}: {list(event.keys())}\n")
-                
+                # Guard so the per-event key list isn't built when DEBUG is off
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Workflow event %s for protocol %s: %s", event_count, protocol_id, list(event.keys()))
+
                 # Check recursion limit early
                 if event_count >= 200:
-                    sys.stderr.write(f"WARNING: Approaching recursion limit for protocol {protocol_id}, forcing halt\n")
+                    logger.warning("Approaching recursion limit for protocol %s, forcing halt", protocol_id)
                     thread_protocol.status = "awaiting_approval"
                     thread_db.commit()
                     break
                 
                 # Each event is a step in the workflow
                 # The checkpointer will save state automatically
-                # Update protocol status periodically
-                thread_db.refresh(thread_protocol)
+                # Re-read status only when signalled by the API or every 10
+                # events (cross-process fallback) instead of one SELECT per event
+                if cancel_event.is_set() or event_count % 10 == 0:
+                    thread_db.refresh(thread_protocol)
+
+                    # Stop if protocol is no longer in reviewing state (halted, approved, or rejected)
+                    if thread_protocol.status not in ["reviewing", "drafting"]:
+                        logger.info("Protocol %s status changed to %s, stopping workflow", protocol_id, thread_protocol.status)
+                        break
+                    cancel_event.clear()
                 
-                # Stop if protocol is no longer in reviewing state (halted, approved, or rejected)
-                if thread_protocol.status not in ["reviewing", "drafting"]:
-                    sys.stderr.write(f"Protocol {protocol_id} status changed to {thread_protocol.status}, stopping workflow\n")
+                # Check if we've hit a finish condition
+                if _workflow_finished(checkpointer, config_with_limit):
+                    logger.debug("Workflow reached finish condition for protocol %s", protocol_id)
+                    # Ensure status is updated before finishing
+                    if thread_protocol.status not in ["awaiting_approval", "approved", "rejected"]:
+                        thread_protocol.status = "awaiting_approval"
+                        thread_db.commit()
                     break
-                
-                # Check if we've hit a finish condition in the event
-                if isinstance(event, dict):
-                    should_finish = False
-                    for node_name, node_data in event.items():
-                        if isinstance(node_data, dict):
-                            if node_data.get("next_agent") == "finish":
-                                sys.stderr.write(f"Workflow reached finish condition at node {node_name}\n")
-                                # Ensure status is updated before finishing
-                                if thread_protocol.status not in ["awaiting_approval", "approved", "rejected"]:
-                                    thread_protocol.status = "awaiting_approval"
-                                    thread_db.commit()
-                                should_finish = True
-                                break
-                            # Also check status in node data
-                            if node_data.get("status") == "awaiting_approval":
-                                sys.stderr.write(f"Workflow reached awaiting_approval status at node {node_name}\n")
-                                thread_protocol.status = "awaiting_approval"
-                                thread_db.commit()
-                                should_finish = True
-                                break
-                    if should_finish:
-                        break
             
-            sys.stderr.write(f"Workflow completed for protocol {protocol_id} after {event_count} events\n")
+            logger.info("Workflow completed for protocol %s after %s events", protocol_id, event_count)
         except Exception as e:
             # Log error and update protocol status
-            error_msg = f"Workflow error: {str(e)}\n{traceback.format_exc()}"
-            sys.stderr.write(error_msg + "\n")
+            logger.exception("Workflow error for protocol %s", protocol_id)
             try:
                 save_agent_thought(
                     thread_db, protocol_id, "supervisor", "Supervisor",
                     f"Workflow failed: {str(e)}",
                     "feedback"
                 )
-                thread_protocol = thread_db.query(Protocol).filter(Protocol.id == protocol_id).first()
+                thread_protocol = thread_db.get(Protocol, protocol_id)
                 if thread_protocol:
                     thread_protocol.status = "rejected"
-                    thread_db.commit()
+                flush_thoughts(thread_db)
             except Exception as db_error:
-                sys.stderr.write(f"Error updating protocol status: {str(db_error)}\n")
+                logger.error("Error updating protocol status: %s", db_error)
         finally:
-            thread_db.close()
-    
-    # Run in background thread
-    executor = ThreadPoolExecutor(max_workers=1)
-    future = executor.submit(run_sync)
+            # Flush any state writes buffered by the checkpointer (end_of_workflow mode)
+            if checkpointer is not None:
+                try:
+                    checkpointer.flush()
+                except Exception as flush_error:
+                    logger.error("Error flushing checkpointer: %s", flush_error)
+            try:
+                flush_thoughts(thread_db)
+            except Exception as flush_error:
+                logger.error("Error flushing buffered thoughts: %s", flush_error)
+            # Drop this protocol's cancellation event (mirrors the
+            # _inflight_workflows done-callback): entries would otherwise
+            # accumulate for every protocol ever run. A later resume
+            # recreates it on demand via setdefault.
+            with _cancellation_lock:
+                _cancellation_events.pop(protocol_id, None)
+            WorkflowSession.remove()
     
+    # Run in the shared background pool, coalescing duplicate submissions:
+    # if an identical run is already in flight, hand back its future instead
+    # of starting a second one
+    key = _workflow_fingerprint(protocol_id, intent, protocol_type)
+    with _inflight_lock:
+        existing = _inflight_workflows.get(key)
+        if existing is not None and not existing.done():
+            logger.info("Workflow for protocol %s already in flight, reusing", protocol_id)
+            return existing
+        future = _WORKFLOW_EXECUTOR.submit(run_sync)
+        _inflight_workflows[key] = future
+    future.add_done_callback(lambda f: _inflight_workflows.pop(key, None))
+
     return future
 
 
+async def arun_protocol_workflow(db: Session, protocol_id: str, intent: str, protocol_type: str):
+    """Await a protocol workflow from async code without blocking the event loop.
+
+    The workflow itself stays on the shared thread pool (the agent nodes and
+    SQLAlchemy sessions are synchronous); this wraps the resulting Future so
+    async callers can await completion instead of polling it.
+    """
+    future = run_protocol_workflow(db, protocol_id, intent, protocol_type)
+    return await asyncio.wrap_future(future)
+
+
 def resume_interrupted_workflows(db: Session):
     """Resume any workflows that were interrupted (e.g., by server crash)."""
-    # Find protocols that are in progress but not completed
-    interrupted_protocols = db.query(Protocol).filter(
+    # Fetch just the columns the submissions need; yield_per streams rows in
+    # batches so startup memory doesn't scale with the number of active
+    # protocols. The status filter is index-backed (Protocol.status is
+    # indexed), and the runs themselves fan out across the shared pool.
+    rows = db.query(Protocol.id, Protocol.intent, Protocol.protocol_type).filter(
         Protocol.status.in_(["drafting", "reviewing"])
-    ).all()
-    
-    for protocol in interrupted_protocols:
+    ).yield_per(100)
+
+    failed_ids = []
+    for row in rows:
         try:
             # Resume the workflow
-            run_protocol_workflow(
-                db,
-                protocol.id,
-                protocol.intent,
-                protocol.protocol_type
-            )
+            run_protocol_workflow(db, row.id, row.intent, row.protocol_type)
         except Exception as e:
             # Log error but continue with other protocols
-            sys.stderr.write(f"Failed to resume protocol {protocol.id}: {str(e)}\n")
-            protocol.status = "rejected"
-            db.commit()
+            logger.error("Failed to resume protocol %s: %s", row.id, e)
+            failed_ids.append(row.id)
+
+    # Mark failures after the loop in one UPDATE: committing while the
+    # yield_per cursor is still open would close it mid-iteration
+    if failed_ids:
+        db.execute(
+            sa_update(Protocol).where(Protocol.id.in_(failed_ids)).values(status="rejected")
+        )
+        db.commit()
 
@@ -5,7 +5,7 @@ from .safety_guardian import safety_guardian_node
 from .clinical_critic import clinical_critic_node
 from .halt import halt_node
 from .finalize import finalize_node
-from .common import save_agent_thought
+from .common import save_agent_thought, flush_thoughts
 
 __all__ = [
     "supervisor_node",
@@ -15,5 +15,6 @@ __all__ = [
     "halt_node",
     "finalize_node",
     "save_agent_thought",
+    "flush_thoughts",
 ]
 
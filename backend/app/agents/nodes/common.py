@@ -1,11 +1,20 @@
 """Common utilities for agent nodes."""
+import threading
 from datetime import datetime, timezone, timedelta
+from weakref import WeakKeyDictionary
 from sqlalchemy.orm import Session
 from app.models.protocol import AgentThought
 
 # IST (Indian Standard Time) is UTC+5:30
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# Thought buffers keyed by session. A supervisor visit emits several thoughts;
+# committing each one separately cost a BEGIN/COMMIT round-trip per thought.
+# Buffering per session and flushing once per node keeps one commit per node
+# visit. WeakKeyDictionary so closed sessions don't pin their buffers.
+_thought_buffers: "WeakKeyDictionary[Session, list]" = WeakKeyDictionary()
+_buffers_lock = threading.Lock()
+
 
 def save_agent_thought(
     db: Session,
@@ -15,7 +24,7 @@ def save_agent_thought(
     content: str,
     thought_type: str = "thought"
 ):
-    """Save an agent thought to the database."""
+    """Buffer an agent thought for the session; flush_thoughts writes it out."""
     thought = AgentThought(
         protocol_id=protocol_id,
         agent_role=agent_role,
@@ -24,9 +33,17 @@ def save_agent_thought(
         type=thought_type,
         timestamp=datetime.now(IST),  # Use IST (Indian Standard Time)
     )
-    db.add(thought)
-    db.flush()  # Flush to get the ID immediately
-    db.commit()  # Commit to make it visible to other sessions
-    db.refresh(thought)  # Refresh to ensure all fields are populated
+    with _buffers_lock:
+        _thought_buffers.setdefault(db, []).append(thought)
     return thought
 
+
+def flush_thoughts(db: Session) -> None:
+    """Write the session's buffered thoughts in one INSERT batch and commit."""
+    with _buffers_lock:
+        buffer = _thought_buffers.pop(db, None)
+    if not buffer:
+        return
+    db.bulk_save_objects(buffer)
+    db.commit()
+
@@ -1,76 +1,57 @@
 """Drafter agent node: creates and revises protocol drafts using LLM."""
+import logging
+import time
 from datetime import datetime, timezone, timedelta
-from app.agents.state import ProtocolState
+from app.agents.state import (
+    MAX_AGENT_NOTES,
+    MAX_REVISION_REASONS,
+    ProtocolState,
+    bounded_append,
+)
 from app.agents.nodes.common import save_agent_thought
 from app.utils.llm import get_llm
+from app.utils.llm_cache import make_key, get_cached, set_cached
+from app.utils.resilience import CircuitOpenError, invoke_resilient
 from app.models.protocol import Protocol, ProtocolVersion
 from sqlalchemy.orm import Session
 
+logger = logging.getLogger(__name__)
+
 # IST (Indian Standard Time) is UTC+5:30
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# Cap on how much of the previous draft gets inlined into a revision prompt.
+# Prefill cost scales linearly with input length, and feedback rarely hinges
+# on anything past this point.
+_MAX_DRAFT_PROMPT_CHARS = 8000
 
-def drafter_node(state: ProtocolState, db: Session) -> ProtocolState:
-    """Drafter agent: creates and revises protocol drafts using LLM."""
-    protocol_id = state["protocol_id"]
-    
-    # Initialize agent_notes if not present
-    if "agent_notes" not in state:
-        state["agent_notes"] = []
-    
-    # Determine if this is a creation or revision
-    is_revision = state.get("needs_revision", False) or (state.get("current_draft", "").strip() != "")
-    thought_message = f"Starting draft {'revision' if is_revision else 'creation'} process."
-    
-    save_agent_thought(
-        db, protocol_id, "drafter", "Drafter",
-        thought_message,
-        "thought"
-    )
-    
-    # Read previous agent notes from scratchpad for context
-    previous_notes = state.get("agent_notes", [])
-    scratchpad_context = ""
-    if previous_notes:
-        scratchpad_context = "\n\nPrevious Agent Notes (for context):\n"
-        for note in previous_notes[-10:]:  # Last 10 notes to avoid prompt bloat
-            scratchpad_context += f"- [{note['role']}]: {note['content']}\n"
-    
-    # Get current scores for context
-    current_safety_score = state.get('safety_score', {}).get('score', 0)
-    current_empathy_score = state.get('empathy_metrics', {}).get('score', 0)
-    iteration = state.get('iteration_count', 0)
-    
-    # Build prompt based on state
-    if state["needs_revision"] and state["revision_reasons"]:
-        prompt = f"""You are a clinical protocol drafter specializing in Cognitive Behavioral Therapy (CBT) exercises.
+# Prompt templates, hoisted so each drafter call only fills in the dynamic
+# sections instead of rebuilding the conditional strings inline. Sections that
+# have no content are passed as empty strings.
+_REVISION_PROMPT_TMPL = """You are a clinical protocol drafter specializing in Cognitive Behavioral Therapy (CBT) exercises.
 
-Your task is to {'revise' if state['current_draft'] else 'create'} a CBT protocol based on the following requirements:
+Your task is to {task_verb} a CBT protocol based on the following requirements:
 
-Protocol Type: {state['protocol_type']}
-Intent: {state['intent']}
+Protocol Type: {protocol_type}
+Intent: {intent}
 
 CURRENT QUALITY SCORES (Iteration {iteration}):
-- Safety Score: {current_safety_score}/100
-- Empathy Score: {current_empathy_score}/100
+- Safety Score: {safety_score}/100
+- Empathy Score: {empathy_score}/100
 
 IMPORTANT: Your goal is to IMPROVE these scores with each revision. Aim for:
-- Safety Score: 80+ (currently {current_safety_score}/100)
-- Empathy Score: 70+ (currently {current_empathy_score}/100)
+- Safety Score: 80+ (currently {safety_score}/100)
+- Empathy Score: 70+ (currently {empathy_score}/100)
 
-{'REVISION NEEDED: ' + ', '.join(state['revision_reasons']) if state['revision_reasons'] else ''}
+{revision_section}
 
-{'Current Draft:' if state['current_draft'] else ''}
-{state['current_draft'] if state['current_draft'] else 'No draft exists yet.'}
+{draft_section}
 
-{'Safety Feedback:' if state.get('safety_score', {}).get('notes') else ''}
-{state.get('safety_score', {}).get('notes', '')}
+{safety_feedback_section}
 
-{'Safety Flags:' if state.get('safety_score', {}).get('flags') else ''}
-{chr(10).join('- ' + str(f) for f in state.get('safety_score', {}).get('flags', [])) if state.get('safety_score', {}).get('flags') else ''}
+{safety_flags_section}
 
-{'Empathy Feedback:' if state.get('empathy_metrics', {}).get('suggestions') else ''}
-{chr(10).join('- ' + s for s in state.get('empathy_metrics', {}).get('suggestions', []))}
+{empathy_section}
 {scratchpad_context}
 
 Create a comprehensive, structured CBT protocol that:
@@ -90,13 +71,13 @@ CRITICAL INSTRUCTIONS:
 - If empathy suggestions exist, incorporate them into the protocol language and structure.
 
 Format the protocol as clear, actionable steps that a clinician can use with a patient."""
-    else:
-        prompt = f"""You are a clinical protocol drafter specializing in Cognitive Behavioral Therapy (CBT) exercises.
+
+_CREATE_PROMPT_TMPL = """You are a clinical protocol drafter specializing in Cognitive Behavioral Therapy (CBT) exercises.
 
 Create a comprehensive CBT protocol based on:
 
-Protocol Type: {state['protocol_type']}
-Intent: {state['intent']}
+Protocol Type: {protocol_type}
+Intent: {intent}
 {scratchpad_context}
 
 QUALITY TARGETS:
@@ -117,61 +98,179 @@ CRITICAL INSTRUCTIONS:
 - Use warm, validating, and culturally sensitive language throughout.
 
 Format as clear, actionable steps that a clinician can use with a patient."""
+
+
+def drafter_node(state: ProtocolState, db: Session) -> ProtocolState:
+    """Drafter agent: creates and revises protocol drafts using LLM."""
+    protocol_id = state["protocol_id"]
+    
+    # Initialize agent_notes if not present
+    if "agent_notes" not in state:
+        state["agent_notes"] = []
+    
+    # Determine if this is a creation or revision
+    is_revision = state.get("needs_revision", False) or (state.get("current_draft", "").strip() != "")
+    thought_message = f"Starting draft {'revision' if is_revision else 'creation'} process."
+    
+    save_agent_thought(
+        db, protocol_id, "drafter", "Drafter",
+        thought_message,
+        "thought"
+    )
     
+    # Read previous agent notes from scratchpad for context
+    previous_notes = state.get("agent_notes", [])
+    scratchpad_context = ""
+    if previous_notes:
+        # Single join instead of += per note (quadratic re-copy); last 10
+        # notes only to avoid prompt bloat, and the list itself is already
+        # capped by bounded_append
+        scratchpad_context = "\n\nPrevious Agent Notes (for context):\n" + "\n".join(
+            f"- [{note['role']}]: {note['content']}" for note in previous_notes[-10:]
+        ) + "\n"
+    
+    # Get current scores for context
+    current_safety_score = state.get('safety_score', {}).get('score', 0)
+    current_empathy_score = state.get('empathy_metrics', {}).get('score', 0)
+    iteration = state.get('iteration_count', 0)
+    
+    # Build prompt based on state. Revisions whose only reasons are transient
+    # drafting errors carry no reviewer feedback to apply, so they retry with
+    # the short create prompt instead of inlining the full draft and feedback
+    # sections (the error note is already in the scratchpad context).
+    error_only_retry = bool(state.get("revision_reasons")) and all(
+        "error" in reason.lower() or "503" in reason
+        for reason in state["revision_reasons"]
+    )
+    if state["needs_revision"] and state["revision_reasons"] and not error_only_retry:
+        # Precompute the conditional sections; empty sections stay empty
+        # strings so no throwaway intermediates are built for them
+        safety_notes = state.get('safety_score', {}).get('notes', '')
+        safety_flags = state.get('safety_score', {}).get('flags', [])
+        empathy_suggestions = state.get('empathy_metrics', {}).get('suggestions', [])
+
+        revision_section = ""
+        if state["revision_reasons"]:
+            revision_section = "REVISION NEEDED: " + ", ".join(state["revision_reasons"])
+
+        if state["current_draft"]:
+            draft_for_prompt = state["current_draft"]
+            if len(draft_for_prompt) > _MAX_DRAFT_PROMPT_CHARS:
+                draft_for_prompt = draft_for_prompt[:_MAX_DRAFT_PROMPT_CHARS] + "\n... (draft truncated for length)"
+            draft_section = f"Current Draft:\n{draft_for_prompt}"
+        else:
+            draft_section = "No draft exists yet."
+
+        safety_feedback_section = f"Safety Feedback:\n{safety_notes}" if safety_notes else ""
+
+        safety_flags_section = ""
+        if safety_flags:
+            flag_bullets = "\n".join("- " + str(f) for f in safety_flags)
+            safety_flags_section = f"Safety Flags:\n{flag_bullets}"
+
+        empathy_section = ""
+        if empathy_suggestions:
+            empathy_bullets = "\n".join("- " + s for s in empathy_suggestions)
+            empathy_section = f"Empathy Feedback:\n{empathy_bullets}"
+
+        prompt = _REVISION_PROMPT_TMPL.format(
+            task_verb="revise" if state["current_draft"] else "create",
+            protocol_type=state["protocol_type"],
+            intent=state["intent"],
+            iteration=iteration,
+            safety_score=current_safety_score,
+            empathy_score=current_empathy_score,
+            revision_section=revision_section,
+            draft_section=draft_section,
+            safety_feedback_section=safety_feedback_section,
+            safety_flags_section=safety_flags_section,
+            empathy_section=empathy_section,
+            scratchpad_context=scratchpad_context,
+        )
+    else:
+        prompt = _CREATE_PROMPT_TMPL.format(
+            protocol_type=state["protocol_type"],
+            intent=state["intent"],
+            scratchpad_context=scratchpad_context,
+        )
+
+    # Initial drafts are cached keyed on the fully rendered prompt: identical
+    # type/intent/scratchpad inputs produce identical prompts (the rendered
+    # notes carry no timestamps), while run-specific note content changes the
+    # key rather than serving a mismatched draft. Revisions are never cached -
+    # they depend on reviewer feedback unique to each run.
+    cache_key = None
+    if not is_revision:
+        cache_key = make_key("drafter_create", prompt)
+
     try:
         llm = get_llm()
-        
+
         # Get protocol for incremental updates
-        protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+        protocol = db.get(Protocol, protocol_id)
         if not protocol:
             raise ValueError(f"Protocol {protocol_id} not found")
-        
+
         # Initialize draft content
         draft_content = ""
-        chunk_buffer = ""
-        chunk_size = 50  # Update database every N characters for smoother streaming
-        
-        # Use streaming to get incremental updates
-        try:
-            # Try streaming first (preferred for real-time updates)
-            if hasattr(llm, 'stream'):
-                # Stream the response and update database incrementally
-                for chunk in llm.stream(prompt):
-                    # Handle different chunk types from LangChain
-                    if hasattr(chunk, 'content'):
-                        chunk_text = chunk.content
-                    elif isinstance(chunk, str):
-                        chunk_text = chunk
-                    else:
-                        chunk_text = str(chunk)
-                    
-                    if chunk_text:
-                        draft_content += chunk_text
-                        chunk_buffer += chunk_text
-                        
-                        # Update database periodically for streaming
-                        if len(chunk_buffer) >= chunk_size:
-                            protocol.current_draft = draft_content
-                            protocol.status = "reviewing"
-                            db.commit()
-                            chunk_buffer = ""  # Reset buffer
-            else:
-                # Fallback to non-streaming if stream() not available
-                response = llm.invoke(prompt)
+        # Debounce streaming commits by time, not character count: a per-50-char
+        # trigger meant dozens of fsyncs per draft. Half a second keeps the SSE
+        # view feeling live while coalescing writes; the final commit after the
+        # loop always flushes whatever streamed in since the last one.
+        commit_interval = 0.5
+        last_commit = time.monotonic()
+
+        cached_draft = get_cached(cache_key) if cache_key else None
+        if cached_draft is not None:
+            # Cache hit: skip the LLM call and write the draft in one update
+            draft_content = cached_draft
+            protocol.current_draft = draft_content
+            protocol.status = "reviewing"
+            db.commit()
+        else:
+            # Use streaming to get incremental updates
+            try:
+                # Try streaming first (preferred for real-time updates)
+                if hasattr(llm, 'stream'):
+                    # Stream the response and update database incrementally
+                    for chunk in llm.stream(prompt):
+                        # Handle different chunk types from LangChain
+                        if hasattr(chunk, 'content'):
+                            chunk_text = chunk.content
+                        elif isinstance(chunk, str):
+                            chunk_text = chunk
+                        else:
+                            chunk_text = str(chunk)
+
+                        if chunk_text:
+                            draft_content += chunk_text
+
+                            # Update database periodically for streaming
+                            if time.monotonic() - last_commit >= commit_interval:
+                                protocol.current_draft = draft_content
+                                protocol.status = "reviewing"
+                                db.commit()
+                                last_commit = time.monotonic()
+                else:
+                    # Fallback to non-streaming if stream() not available
+                    response = invoke_resilient(llm, prompt)
+                    draft_content = response.content if hasattr(response, 'content') else str(response)
+                    protocol.current_draft = draft_content
+                    protocol.status = "reviewing"
+                    db.commit()
+            except Exception as stream_error:
+                # If streaming fails, fall back to non-streaming
+                logger.warning("Streaming failed, falling back to invoke: %s", stream_error)
+                response = invoke_resilient(llm, prompt)
                 draft_content = response.content if hasattr(response, 'content') else str(response)
                 protocol.current_draft = draft_content
                 protocol.status = "reviewing"
                 db.commit()
-        except Exception as stream_error:
-            # If streaming fails, fall back to non-streaming
-            import sys
-            sys.stderr.write(f"Streaming failed, falling back to invoke: {stream_error}\n")
-            response = llm.invoke(prompt)
-            draft_content = response.content if hasattr(response, 'content') else str(response)
-            protocol.current_draft = draft_content
-            protocol.status = "reviewing"
-            db.commit()
-        
+
+            if cache_key and draft_content:
+                set_cached(cache_key, draft_content)
+
+
         # Final update to ensure all content is saved
         state["current_draft"] = draft_content
         protocol.current_draft = draft_content
@@ -187,24 +286,25 @@ Format as clear, actionable steps that a clinician can use with a patient."""
             state["iteration_count"] += 1
         
         protocol.iteration_count = state["iteration_count"]
-        db.commit()
-        
+
         # Write to scratchpad
-        state["agent_notes"].append({
+        bounded_append(state["agent_notes"], {
             "role": "drafter",
             "content": f"Draft {'revised' if state.get('needs_revision') else 'created'} (version {state['iteration_count']}). Length: {len(draft_content)} characters.",
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Create version record
-        version = ProtocolVersion(
-            protocol_id=protocol_id,
-            version=state["iteration_count"],
-            content=draft_content,
-            author="drafter",
-            timestamp=datetime.now(IST),  # Use IST (Indian Standard Time)
-        )
-        db.add(version)
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, MAX_AGENT_NOTES)
+
+        # Version history row: bulk_insert_mappings emits a plain INSERT with
+        # no identity-map/event bookkeeping (the row is never read back in
+        # this node) and shares one commit with the iteration_count update
+        # above instead of committing each separately
+        db.bulk_insert_mappings(ProtocolVersion, [{
+            "protocol_id": protocol_id,
+            "version": state["iteration_count"],
+            "content": draft_content,
+            "author": "drafter",
+            "timestamp": datetime.now(IST),  # Use IST (Indian Standard Time)
+        }])
         db.commit()
         
         # Determine if this is a creation or revision
@@ -223,8 +323,11 @@ Format as clear, actionable steps that a clinician can use with a patient."""
         
     except Exception as e:
         error_msg = str(e)
-        # Check if it's a 503 or API error
-        is_api_error = "503" in error_msg or "unreachable_backend" in error_msg or "Internal server error" in error_msg
+        # Check if it's a 503 or API error. The circuit breaker raises its own
+        # exception type (no "503" in the message), so match it by type — it
+        # only opens after several consecutive endpoint failures.
+        circuit_open = isinstance(e, CircuitOpenError)
+        is_api_error = circuit_open or "503" in error_msg or "unreachable_backend" in error_msg or "Internal server error" in error_msg
         
         # Truncate error message for display
         display_error = error_msg[:150] + "..." if len(error_msg) > 150 else error_msg
@@ -236,15 +339,19 @@ Format as clear, actionable steps that a clinician can use with a patient."""
         )
         
         # Write error to scratchpad
-        state["agent_notes"].append({
+        bounded_append(state["agent_notes"], {
             "role": "drafter",
             "content": f"Error during draft creation: {display_error}",
-            "timestamp": datetime.utcnow().isoformat()
-        })
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, MAX_AGENT_NOTES)
         
-        # Don't loop forever on API errors - mark as failed after a few attempts
+        # Don't loop forever on API errors - mark as failed after a few
+        # attempts. An open breaker halts immediately: it already represents
+        # several consecutive endpoint failures, and its constant message
+        # would be deduplicated out of revision_reasons, pinning error_count
+        # below the threshold forever.
         error_count = len([r for r in state.get("revision_reasons", []) if "Drafting error" in r or "503" in r])
-        if is_api_error and error_count >= 2:
+        if is_api_error and (circuit_open or error_count >= 2):
             # Too many API errors, halt the workflow
             state["status"] = "rejected"
             state["next_agent"] = "halt"
@@ -253,7 +360,7 @@ Format as clear, actionable steps that a clinician can use with a patient."""
                 "Too many API errors (503). Workflow halted. The LLM API may be temporarily unavailable. Please try again later or check your API key.",
                 "feedback"
             )
-            protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            protocol = db.get(Protocol, protocol_id)
             if protocol:
                 protocol.status = "rejected"
                 db.commit()
@@ -264,7 +371,7 @@ Format as clear, actionable steps that a clinician can use with a patient."""
                 if "revision_reasons" not in state:
                     state["revision_reasons"] = []
                 state["needs_revision"] = True
-                state["revision_reasons"].append(error_reason)
+                bounded_append(state["revision_reasons"], error_reason, MAX_REVISION_REASONS)
     
     state["last_agent"] = "drafter"
     # Don't set next_agent - we return to supervisor via direct edge, supervisor will set next_agent
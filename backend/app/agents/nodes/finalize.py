@@ -1,5 +1,6 @@
 """Finalize node: saves the final approved artifact."""
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import func
 from app.agents.state import ProtocolState
 from app.agents.nodes.common import save_agent_thought
 from app.models.protocol import Protocol, ProtocolVersion
@@ -14,12 +15,17 @@ def finalize_node(state: ProtocolState, db: Session) -> ProtocolState:
     protocol_id = state["protocol_id"]
     
     # Update protocol in database
-    protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+    protocol = db.get(Protocol, protocol_id)
     if protocol:
-        # Save final version
+        # Save final version. MAX() aggregate instead of len(protocol.versions):
+        # the relationship lazy-loads every version row (full content included)
+        # just to count them.
+        next_version = db.query(
+            func.coalesce(func.max(ProtocolVersion.version), 0) + 1
+        ).filter(ProtocolVersion.protocol_id == protocol_id).scalar()
         final_version = ProtocolVersion(
             protocol_id=protocol_id,
-            version=len(protocol.versions) + 1,
+            version=next_version,
             content=protocol.current_draft or state.get("current_draft", ""),
             author="system",
             timestamp=datetime.now(IST),  # Use IST (Indian Standard Time)
@@ -10,7 +10,7 @@ def halt_node(state: ProtocolState, db: Session) -> ProtocolState:
     protocol_id = state["protocol_id"]
     
     # Update protocol in database
-    protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+    protocol = db.get(Protocol, protocol_id)
     if protocol:
         protocol.status = "awaiting_approval"
         # Save current draft to checkpoint
@@ -1,28 +1,58 @@
 """Safety Guardian agent node: checks for safety issues and medical advice."""
-from datetime import datetime
+import json
+import logging
+import re
+from typing import List
+from pydantic import BaseModel, Field
 from app.agents.state import ProtocolState
 from app.agents.nodes.common import save_agent_thought
 from app.utils.llm import get_llm
+from app.utils.llm_cache import make_key, get_cached, set_cached
 from app.utils.json_parser import parse_json_response
+from app.utils.resilience import invoke_resilient
 from app.models.protocol import Protocol
 from sqlalchemy.orm import Session
 
+logger = logging.getLogger(__name__)
+
+
+class SafetyAssessment(BaseModel):
+    """Structured safety review returned directly by the LLM."""
+    score: int = Field(default=75, ge=0, le=100)
+    flags: List[str] = Field(default_factory=list)
+    notes: str = "Safety review completed"
+
+
+# Advisory keyword screen, compiled once at import. Matched category labels
+# are attached to the LLM review's flags so a human approver can see which
+# high-risk topics the draft touches; they never replace the review or set
+# the score, because the patterns match protective language (crisis-line
+# footers, "do not stop taking your medication without consulting your
+# provider") as readily as harmful content. One pass at C speed via re - no
+# pyahocorasick dependency needed at this vocabulary size.
+_DANGER_PATTERNS = [
+    ("Self-harm language", re.compile(r"self[\s-]?harm|hurt(ing)? (yourself|themselves)|cut(ting)? (yourself|themselves)", re.IGNORECASE)),
+    ("Suicide references", re.compile(r"suicid|end(ing)? (your|their) life|kill (yourself|themselves)", re.IGNORECASE)),
+    ("Dosage instructions", re.compile(r"\b\d+\s?(mg|mcg|milligrams?)\b|dosage|lethal dose", re.IGNORECASE)),
+    ("Medication directives", re.compile(r"(stop|start|increase|decrease) (taking )?(your )?medicat|prescri(be|ption)", re.IGNORECASE)),
+    ("Diagnosis claims", re.compile(r"you (have|are suffering from) [a-z]+ (disorder|disease)|diagnos(e|is) (you|yourself)", re.IGNORECASE)),
+    ("Substance misuse", re.compile(r"overdose|mixing (alcohol|drugs)|recreational drug", re.IGNORECASE)),
+]
+
+# Compiled once: critical-flag detection and numeric score extraction used in
+# result normalization. One regex pass per flag instead of a lowercased
+# substring scan per (flag, keyword) pair.
+_CRITICAL_RE = re.compile(r"self-harm|suicide|dangerous|medical advice|licensure|unsafe", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\d+")
 
-def safety_guardian_node(state: ProtocolState, db: Session) -> ProtocolState:
-    """Safety Guardian agent: checks for safety issues and medical advice."""
-    protocol_id = state["protocol_id"]
-    
-    # Initialize agent_notes if not present
-    if "agent_notes" not in state:
-        state["agent_notes"] = []
-    
-    save_agent_thought(
-        db, protocol_id, "safety_guardian", "Safety Guardian",
-        "Reviewing protocol for safety concerns and inappropriate medical advice.",
-        "thought"
-    )
-    
-    prompt = f"""You are a safety guardian reviewing a CBT protocol for potential safety issues.
+
+def _screen_danger(draft: str) -> list:
+    """Return the labels of danger patterns matching the draft."""
+    return [label for label, pattern in _DANGER_PATTERNS if pattern.search(draft)]
+
+
+# Review prompt, hoisted so each call only interpolates the draft text
+_SAFETY_PROMPT_TMPL = """You are a safety guardian reviewing a CBT protocol for potential safety issues.
 
 Review the following protocol draft and identify:
 1. Any content that could encourage self-harm or dangerous behaviors
@@ -31,7 +61,7 @@ Review the following protocol draft and identify:
 4. Any other safety concerns
 
 Protocol Draft:
-{state['current_draft']}
+{current_draft}
 
 Provide your assessment in JSON format ONLY. Return ONLY the JSON object with this exact structure:
 
@@ -60,12 +90,28 @@ IMPORTANT:
 - Do NOT use nested structures in the "notes" field
 
 Be thorough but fair. Only flag genuine safety concerns. Return ONLY valid JSON."""
-    
-    try:
-        llm = get_llm()
-        response = llm.invoke(prompt)
+
+
+def _run_safety_review(prompt: str) -> dict:
+    """Run the safety LLM call and normalize the result into a score dict."""
+    llm = get_llm(role="reviewer")
+
+    # Prefer provider-validated structured output: it skips the
+    # JSON-in-markdown parsing entirely and removes the failed-parse →
+    # wrong-score → extra-revision path. Fall back to text parsing for
+    # providers (or transient failures) where it isn't supported.
+    safety_data = None
+    if hasattr(llm, "with_structured_output"):
+        try:
+            assessment = invoke_resilient(llm.with_structured_output(SafetyAssessment), prompt)
+            safety_data = assessment.model_dump()
+        except Exception as structured_error:
+            logger.warning("Structured safety output failed, parsing text instead: %s", structured_error)
+
+    if safety_data is None:
+        response = invoke_resilient(llm, prompt)
         response_text = response.content if hasattr(response, 'content') else str(response)
-        
+
         # Parse JSON from response
         default_safety = {
             "score": 75,  # Neutral default, not 85
@@ -73,130 +119,143 @@ Be thorough but fair. Only flag genuine safety concerns. Return ONLY valid JSON.
             "notes": response_text[:500]
         }
         safety_data = parse_json_response(response_text, default_safety)
-        
-        # Ensure score is a valid integer between 0-100
-        parsed_score = safety_data.get("score", 75)
-        if isinstance(parsed_score, str):
-            # Try to extract number from string
-            import re
-            numbers = re.findall(r'\d+', str(parsed_score))
-            parsed_score = int(numbers[0]) if numbers else 75
-        parsed_score = max(0, min(100, int(parsed_score)))  # Clamp to 0-100
-        
-        # Normalize flags - ensure it's a list of strings and make them human-readable
-        flags = safety_data.get("flags", [])
-        if isinstance(flags, str):
-            flags = [flags]
-        elif not isinstance(flags, list):
-            flags = []
-        flags = [str(f) if not isinstance(f, str) else f for f in flags]
-        
-        # Convert flags to human-readable format (remove underscores, capitalize)
-        def format_flag(flag: str) -> str:
-            """Convert flag from snake_case to Title Case."""
-            # Replace underscores with spaces
-            formatted = flag.replace("_", " ")
-            # Capitalize each word
-            words = formatted.split()
-            formatted = " ".join(word.capitalize() for word in words)
-            return formatted
-        
-        flags = [format_flag(flag) for flag in flags]
-        
-        # Normalize notes - must be a string, not a dict
-        notes = safety_data.get("notes", "Safety review completed")
-        if isinstance(notes, dict):
-            # If notes is a dict, convert it to a readable string
-            import json
-            notes = json.dumps(notes, indent=2)
-        elif not isinstance(notes, str):
-            notes = str(notes) if notes else "Safety review completed"
-        
-        # Limit notes length to prevent database issues
-        if len(notes) > 5000:
-            notes = notes[:5000] + "... (truncated)"
-        
-        # Safety check: Automatically adjust score based on number of flags
-        # If there are many flags, the score should be lower
-        flag_count = len(flags)
-        if flag_count >= 5:
-            # 5+ flags = significant concerns, cap score at 75
-            parsed_score = min(parsed_score, 75)
-        elif flag_count >= 3:
-            # 3-4 flags = moderate concerns, cap score at 80
-            parsed_score = min(parsed_score, 80)
-        elif flag_count >= 1:
-            # 1-2 flags = minor concerns, cap score at 90
-            parsed_score = min(parsed_score, 90)
-        
-        # Check for critical flags that should lower the score
-        critical_keywords = ["self-harm", "suicide", "dangerous", "medical advice", "licensure", "unsafe"]
-        has_critical = any(keyword.lower() in flag.lower() for flag in flags for keyword in critical_keywords)
-        if has_critical and parsed_score > 70:
-            # Critical safety issues should result in score <= 70
-            parsed_score = min(parsed_score, 70)
-        
-        state["safety_score"] = {
-            "score": parsed_score,
-            "flags": flags,
-            "notes": notes
-        }
-        
-        # Write to scratchpad
-        if state["safety_score"]["flags"]:
-            for flag in state["safety_score"]["flags"]:
-                state["agent_notes"].append({
-                    "role": "safety_guardian",
-                    "content": f"Safety flag: {flag}",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-        
-        # Add summary note to scratchpad
-        state["agent_notes"].append({
-            "role": "safety_guardian",
-            "content": f"Safety review complete. Score: {state['safety_score']['score']}/100. {len(state['safety_score']['flags'])} flag(s) raised.",
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Update protocol in database
-        protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
-        if protocol:
-            protocol.safety_score = state["safety_score"]
+
+    # Ensure score is a valid integer between 0-100
+    parsed_score = safety_data.get("score", 75)
+    if isinstance(parsed_score, str):
+        # Try to extract number from string
+        numbers = _NUMBER_RE.findall(str(parsed_score))
+        parsed_score = int(numbers[0]) if numbers else 75
+    parsed_score = max(0, min(100, int(parsed_score)))  # Clamp to 0-100
+
+    # Normalize flags - ensure it's a list of strings and make them human-readable
+    flags = safety_data.get("flags", [])
+    if isinstance(flags, str):
+        flags = [flags]
+    elif not isinstance(flags, list):
+        flags = []
+    flags = [str(f) if not isinstance(f, str) else f for f in flags]
+
+    # Convert flags to human-readable format (remove underscores, capitalize)
+    def format_flag(flag: str) -> str:
+        """Convert flag from snake_case to Title Case."""
+        # Replace underscores with spaces
+        formatted = flag.replace("_", " ")
+        # Capitalize each word
+        words = formatted.split()
+        formatted = " ".join(word.capitalize() for word in words)
+        return formatted
+
+    flags = [format_flag(flag) for flag in flags]
+
+    # Normalize notes - must be a string, not a dict
+    notes = safety_data.get("notes", "Safety review completed")
+    if isinstance(notes, dict):
+        # If notes is a dict, convert it to a readable string
+        notes = json.dumps(notes, indent=2)
+    elif not isinstance(notes, str):
+        notes = str(notes) if notes else "Safety review completed"
+
+    # Limit notes length to prevent database issues
+    if len(notes) > 5000:
+        notes = notes[:5000] + "... (truncated)"
+
+    # Safety check: Automatically adjust score based on number of flags
+    # If there are many flags, the score should be lower
+    flag_count = len(flags)
+    if flag_count >= 5:
+        # 5+ flags = significant concerns, cap score at 75
+        parsed_score = min(parsed_score, 75)
+    elif flag_count >= 3:
+        # 3-4 flags = moderate concerns, cap score at 80
+        parsed_score = min(parsed_score, 80)
+    elif flag_count >= 1:
+        # 1-2 flags = minor concerns, cap score at 90
+        parsed_score = min(parsed_score, 90)
+
+    # Check for critical flags that should lower the score
+    has_critical = any(_CRITICAL_RE.search(flag) for flag in flags)
+    if has_critical and parsed_score > 70:
+        # Critical safety issues should result in score <= 70
+        parsed_score = min(parsed_score, 70)
+
+    return {
+        "score": parsed_score,
+        "flags": flags,
+        "notes": notes
+    }
+
+
+def safety_guardian_node(state: ProtocolState, db: Session) -> dict:
+    """Safety Guardian agent: checks for safety issues and medical advice.
+
+    Returns a partial state update ({"safety_score": ...}) rather than the
+    full state: this node can run in the same super-step as the clinical
+    critic, and concurrent writes to shared keys would collide.
+    """
+    protocol_id = state["protocol_id"]
+
+    save_agent_thought(
+        db, protocol_id, "safety_guardian", "Safety Guardian",
+        "Reviewing protocol for safety concerns and inappropriate medical advice.",
+        "thought"
+    )
+    
+    prompt = _SAFETY_PROMPT_TMPL.format(current_draft=state["current_draft"])
+    
+    # Identical draft text gets an identical review; key on the draft only
+    # (not notes/iteration) so unchanged drafts skip the LLM round-trip
+    cache_key = make_key("safety_guardian", state.get("current_draft", ""))
+    cached_score = get_cached(cache_key)
+
+    try:
+        if cached_score is not None:
+            safety_score = cached_score
+        else:
+            safety_score = _run_safety_review(prompt)
+            # Advisory keyword screen: surface matched categories as extra
+            # flags for the human approver. The labels never replace the
+            # review or touch the score - a crisis-resources footer trips the
+            # self-harm and medication patterns without being unsafe.
+            for label in _screen_danger(state.get("current_draft", "")):
+                advisory_flag = f"Keyword screen: {label}"
+                if advisory_flag not in safety_score["flags"]:
+                    safety_score["flags"].append(advisory_flag)
+            set_cached(cache_key, safety_score)
+
+        # Update protocol in database; skip the UPDATE entirely when a re-run
+        # produced identical scores (common on cache hits and idempotent
+        # re-reviews) - no dirty tracking, no commit, no WAL write
+        protocol = db.get(Protocol, protocol_id)
+        if protocol and protocol.safety_score != safety_score:
+            protocol.safety_score = safety_score
             db.commit()
-            db.refresh(protocol)
-        
+
         save_agent_thought(
             db, protocol_id, "safety_guardian", "Safety Guardian",
-            f"Safety review complete. Score: {state['safety_score']['score']}/100. Flags: {len(state['safety_score']['flags'])}",
+            f"Safety review complete. Score: {safety_score['score']}/100. Flags: {len(safety_score['flags'])}",
             "feedback"
         )
-        
-        if state["safety_score"]["flags"]:
+
+        if safety_score["flags"]:
             save_agent_thought(
                 db, protocol_id, "safety_guardian", "Safety Guardian",
-                f"Safety flags: {', '.join(state['safety_score']['flags'])}",
+                f"Safety flags: {', '.join(safety_score['flags'])}",
                 "feedback"
             )
-        
+
     except Exception as e:
         save_agent_thought(
             db, protocol_id, "safety_guardian", "Safety Guardian",
             f"Error during safety review: {str(e)}",
             "feedback"
         )
-        state["safety_score"] = {
+        safety_score = {
             "score": 50,  # Conservative default
             "flags": ["Safety review error"],
             "notes": f"Error: {str(e)}"
         }
-        # Write error to scratchpad
-        state["agent_notes"].append({
-            "role": "safety_guardian",
-            "content": f"Error during safety review: {str(e)}",
-            "timestamp": datetime.utcnow().isoformat()
-        })
-    
-    state["last_agent"] = "safety_guardian"
+
     # Don't set next_agent - we return to supervisor via direct edge, supervisor will set next_agent
-    return state
+    return {"safety_score": safety_score}
 
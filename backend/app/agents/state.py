@@ -10,6 +10,26 @@ class AgentNote(TypedDict):
     timestamp: str
 
 
+# Caps for the unbounded state lists. The checkpointer copies the whole state
+# every super-step, so an uncapped scratchpad makes cumulative checkpoint
+# bytes grow quadratically over a long workflow. Old scratchpad entries are
+# safe to drop: every note is also persisted as an AgentThought row, and the
+# prompts only ever read the most recent few entries.
+MAX_AGENT_NOTES = 50
+MAX_REVISION_REASONS = 20
+
+
+def bounded_append(items: list, item, cap: int) -> None:
+    """Append to a state list, dropping the oldest entries beyond cap.
+
+    Plain lists (not deques) so existing slicing like agent_notes[-10:] keeps
+    working and the state stays JSON/pickle-friendly for the checkpointer.
+    """
+    items.append(item)
+    if len(items) > cap:
+        del items[: len(items) - cap]
+
+
 class ProtocolState(TypedDict):
     """Shared state (blackboard) for the multi-agent system."""
     # Core protocol data
@@ -46,6 +66,9 @@ class ProtocolState(TypedDict):
     needs_revision: bool
     is_approved: bool
     should_halt: bool
+    # Simple low-risk intents skip the supervisor's LLM routing call (never
+    # the reviews themselves); recorded in state so the audit trail shows it
+    fast_path: bool
     
     # Metadata
     last_agent: str
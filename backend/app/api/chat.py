@@ -7,9 +7,11 @@ from app.api.auth import get_current_user
 from app.models.protocol import User, Protocol, AgentThought
 import json
 import asyncio
-import traceback
+import logging
 from typing import Optional
 
+
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -63,8 +65,17 @@ async def stream_protocol_content(
                         # Client disconnected, exit gracefully
                         return
                 
-                # Get new agent thoughts
-                query = db.query(AgentThought).filter(
+                # Get new agent thoughts. Select only the streamed columns as
+                # plain tuples — this loop polls continuously, and full ORM
+                # objects would pay identity-map bookkeeping per poll
+                query = db.query(
+                    AgentThought.id,
+                    AgentThought.agent_role,
+                    AgentThought.agent_name,
+                    AgentThought.content,
+                    AgentThought.timestamp,
+                    AgentThought.type,
+                ).filter(
                     AgentThought.protocol_id == protocol_id
                 ).order_by(AgentThought.timestamp)
                 
@@ -94,8 +105,7 @@ async def stream_protocol_content(
                         return
                     except Exception as e:
                         # Log other errors but continue
-                        import sys
-                        sys.stderr.write(f"Error sending thought in chat stream: {str(e)}\n")
+                        logger.warning("Error sending thought in chat stream: %s", e)
                         continue
                 
                 # Check if protocol is complete - include awaiting_approval as a complete state
@@ -120,12 +130,10 @@ async def stream_protocol_content(
                 await asyncio.sleep(0.1)  # Faster updates for smoother streaming
         except (GeneratorExit, BrokenPipeError, ConnectionResetError, OSError):
             # Client disconnected, exit gracefully
-            import sys
-            sys.stderr.write("Client disconnected from chat stream\n")
+            logger.debug("Client disconnected from chat stream")
         except Exception as e:
             # Log unexpected errors
-            import sys
-            sys.stderr.write(f"Unexpected error in chat stream: {str(e)}\n{traceback.format_exc()}\n")
+            logger.exception("Unexpected error in chat stream")
     
     return StreamingResponse(
         generate_stream(),
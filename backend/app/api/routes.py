@@ -1,12 +1,11 @@
 """API routes for authentication and protocols."""
+import logging
 import threading
 import time
-import traceback
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from app.config import settings
 from app.database import get_db, SessionLocal
 from app.models.protocol import User, Protocol, ProtocolVersion, AgentThought
@@ -26,13 +25,15 @@ from app.api.auth import (
     authenticate_user,
     create_access_token,
 )
-from app.agents.graph import create_protocol_workflow, run_protocol_workflow
-from app.agents.nodes import save_agent_thought, finalize_node
+from app.agents.graph import create_protocol_workflow, run_protocol_workflow, signal_status_change, submit_background
+from app.agents.nodes import save_agent_thought, flush_thoughts, finalize_node
 from app.agents.state import ProtocolState
 from app.utils.protocol_helpers import get_protocol_or_404, verify_protocol_status
 from app.api.sse import router as sse_router
 from app.api.chat import router as chat_router
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 router.include_router(sse_router)
 router.include_router(chat_router)
@@ -125,6 +126,7 @@ async def list_protocols(
     # Get paginated protocols
     protocols = (
         db.query(Protocol)
+        .options(selectinload(Protocol.versions), selectinload(Protocol.agent_thoughts))
         .filter(Protocol.user_id == current_user.id)
         .order_by(Protocol.created_at.desc())
         .offset(skip)
@@ -187,13 +189,13 @@ async def create_protocol(
         def handle_workflow_error(f):
             try:
                 f.result()  # This will raise any exception that occurred
-            except Exception as e:
-                error_msg = f"Workflow execution error: {str(e)}\n{traceback.format_exc()}"
-                print(error_msg)
+            except Exception:
+                # logger.exception defers the stack walk/format to the handler
+                logger.exception("Workflow execution error for protocol %s", protocol.id)
                 # Update protocol status in a new session
                 error_db = SessionLocal()
                 try:
-                    error_protocol = error_db.query(Protocol).filter(Protocol.id == protocol.id).first()
+                    error_protocol = error_db.get(Protocol, protocol.id)
                     if error_protocol:
                         error_protocol.status = "rejected"
                         error_db.commit()
@@ -244,15 +246,19 @@ async def approve_protocol(
     # Set approval metadata
     protocol.approved_at = datetime.utcnow()
     protocol.approved_by = current_user.id
+
+    # Wake any running workflow thread so it notices the approval
+    signal_status_change(protocol_id)
     
     # Resume workflow to finalize node
-    # Save approval thought
+    # Save approval thought (flush also commits the approval metadata above)
     save_agent_thought(
         db, protocol_id, "supervisor", "Supervisor",
         "Human approval received. Resuming workflow to finalize artifact.",
         "action"
     )
-    
+    flush_thoughts(db)
+
     # Reconstruct state from database (checkpoint state)
     resume_state: ProtocolState = {
         "protocol_id": protocol_id,
@@ -271,23 +277,25 @@ async def approve_protocol(
         "should_halt": False,
         "last_agent": "halt",
         "revision_reasons": [],
+        # Finalize-only resume: routing is fixed, the fast path is irrelevant
+        "fast_path": False,
     }
     
-    # Run finalize node in background
-    executor = ThreadPoolExecutor(max_workers=1)
-    
+    # Run finalize node in background on the shared workflow pool; a per-call
+    # ThreadPoolExecutor would leak its worker thread (never shut down)
     def finalize_sync():
         finalize_db = SessionLocal()
         try:
-            finalize_protocol = finalize_db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            finalize_protocol = finalize_db.get(Protocol, protocol_id)
             if finalize_protocol:
                 finalize_state = resume_state.copy()
                 finalize_state["current_draft"] = finalize_protocol.current_draft
                 finalize_node(finalize_state, finalize_db)
         finally:
+            flush_thoughts(finalize_db)
             finalize_db.close()
     
-    executor.submit(finalize_sync)
+    submit_background(finalize_sync)
     
     db.refresh(protocol)
     return ProtocolResponse.from_orm(protocol)
@@ -307,7 +315,10 @@ async def reject_protocol(
     protocol.rejected_reason = request.reason
     db.commit()
     db.refresh(protocol)
-    
+
+    # Wake any running workflow thread so it stops promptly
+    signal_status_change(protocol_id)
+
     return ProtocolResponse.from_orm(protocol)
 
 
@@ -323,7 +334,10 @@ async def halt_protocol(
     # Update status to awaiting_approval
     protocol.status = "awaiting_approval"
     db.commit()
-    
+
+    # Wake any running workflow thread so it stops promptly
+    signal_status_change(protocol_id)
+
     return {"message": "Protocol halted successfully"}
 
 
@@ -338,7 +352,7 @@ async def resume_protocol(
     verify_protocol_status(protocol, "awaiting_approval", "Protocol is not halted")
     
     # Resume workflow by continuing from checkpoint
-    app = create_protocol_workflow(db, protocol_id)
+    app, checkpointer = create_protocol_workflow(db, protocol_id)
     
     # Get current state from checkpoint
     config = {
@@ -9,10 +9,12 @@ from jose import JWTError, jwt
 from app.config import settings
 import json
 import asyncio
-import traceback
+import logging
 from datetime import datetime, timedelta
 from typing import Optional
 
+
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -81,8 +83,17 @@ async def stream_protocol_thoughts(
                 # Expire all to ensure we see latest data from other sessions
                 db.expire_all()
                 
-                # Get new thoughts since last check
-                query = db.query(AgentThought).filter(
+                # Get new thoughts since last check. Select only the streamed
+                # columns as plain tuples — this loop runs every 50ms, and full
+                # ORM objects would pay identity-map bookkeeping per poll
+                query = db.query(
+                    AgentThought.id,
+                    AgentThought.agent_role,
+                    AgentThought.agent_name,
+                    AgentThought.content,
+                    AgentThought.timestamp,
+                    AgentThought.type,
+                ).filter(
                     AgentThought.protocol_id == protocol_id
                 ).order_by(AgentThought.timestamp)
                 
@@ -113,13 +124,11 @@ async def stream_protocol_thoughts(
                         await asyncio.sleep(0.01)  # 10ms delay between messages
                     except (GeneratorExit, BrokenPipeError, ConnectionResetError, OSError) as e:
                         # Client disconnected, exit gracefully
-                        import sys
-                        sys.stderr.write(f"Client disconnected during thought streaming: {type(e).__name__}\n")
+                        logger.debug("Client disconnected during thought streaming: %s", type(e).__name__)
                         return
                     except Exception as e:
                         # Log other errors but continue
-                        import sys
-                        sys.stderr.write(f"Error sending thought: {str(e)}\n")
+                        logger.warning("Error sending thought: %s", e)
                         continue
                 
                 # Mark initial thoughts as sent after first batch
@@ -128,7 +137,7 @@ async def stream_protocol_thoughts(
                 
                 # Only send protocol updates when workflow is complete (awaiting_approval, approved, rejected)
                 # This prevents streaming content during the agent thought process
-                protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+                protocol = db.get(Protocol, protocol_id)
                 if protocol:
                     current_status = protocol.status
                     current_iteration = protocol.iteration_count
@@ -201,12 +210,10 @@ async def stream_protocol_thoughts(
                 await asyncio.sleep(0.05)
         except (GeneratorExit, BrokenPipeError, ConnectionResetError, OSError):
             # Client disconnected, exit gracefully
-            import sys
-            sys.stderr.write("Client disconnected from SSE stream\n")
+            logger.debug("Client disconnected from SSE stream")
         except Exception as e:
             # Log unexpected errors
-            import sys
-            sys.stderr.write(f"Unexpected error in SSE stream: {str(e)}\n{traceback.format_exc()}\n")
+            logger.exception("Unexpected error in SSE stream")
     
     return StreamingResponse(
         event_generator(),
@@ -15,6 +15,8 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./cerina_foundry.db"
+    DB_POOL_SIZE: int = 20  # Persistent connections kept in the pool (non-SQLite)
+    DB_MAX_OVERFLOW: int = 40  # Extra connections allowed under burst load
     
     # LLM Provider Selection
     LLM_PROVIDER: str = "mistral"  # "huggingface" or "mistral"
@@ -34,6 +36,12 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",
     ]
     
+    # Agent workflow
+    WORKFLOW_POOL_SIZE: int = 8  # Worker threads shared by all background workflow runs
+    LOG_LEVEL: str = "INFO"  # Set to DEBUG for per-event workflow logging
+    LLM_CACHE_ENABLED: bool = True  # Reuse LLM results for identical drafts/intents
+    LLM_CACHE_SIZE: int = 256  # Max entries kept in the in-process LLM result cache
+
     # MCP Server
     MCP_SERVER_NAME: str = "cerina-foundry"
     MCP_SERVER_VERSION: str = "1.0.0"
@@ -1,19 +1,47 @@
 """Database setup and session management."""
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from app.config import settings
 
 # Create database engine
+# Background workflow threads each check a connection out of the pool, so the
+# pool is sized explicitly instead of relying on SQLAlchemy defaults (5/10).
+# SQLite ignores the queue-pool sizing options, so they are only applied to
+# server databases.
+_engine_kwargs = {}
+if "sqlite" in settings.DATABASE_URL:
+    _engine_kwargs["connect_args"] = {"check_same_thread": False}
+else:
+    _engine_kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=1800,  # Recycle connections before server-side timeouts
+        pool_use_lifo=True,  # Prefer warm connections under bursty load
+    )
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    pool_pre_ping=True,  # Drop stale connections instead of failing the query
     echo=False,  # Set to True for SQL query logging
+    # JSON columns (safety_score, empathy_metrics) go through the C-backed
+    # orjson codec instead of stdlib json
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
+    **_engine_kwargs,
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Thread-scoped registry for background workflow threads. Worker threads in
+# the workflow pool are long-lived and reused across runs, so scoping the
+# session to the thread reuses its connection instead of checking a fresh one
+# out of the pool per run. Callers must pair it with WorkflowSession.remove()
+# in a finally block so state never leaks into the next run on that thread.
+WorkflowSession = scoped_session(SessionLocal)
+
 # Base class for models
 Base = declarative_base()
 
@@ -1,5 +1,10 @@
 """FastAPI application entry point."""
+import atexit
+import logging
+import sys
 import traceback
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -11,6 +16,33 @@ from app.api.routes import router as api_router
 from app.agents.graph import resume_interrupted_workflows
 from app.utils.llm import get_llm
 
+
+def _configure_logging():
+    """Route app loggers through a queue so log I/O stays off workflow threads.
+
+    Records are handed to an in-memory queue and written to stderr by a
+    listener thread (stdout is reserved for the MCP JSON-RPC channel), so
+    workflow threads never block on a slow tty/container log.
+    """
+    app_logger = logging.getLogger("app")
+    if any(isinstance(h, QueueHandler) for h in app_logger.handlers):
+        return  # Already configured (e.g. uvicorn reload)
+
+    log_queue = SimpleQueue()
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    listener = QueueListener(log_queue, stderr_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    app_logger.addHandler(QueueHandler(log_queue))
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+
+
+_configure_logging()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Cerina Protocol Foundry API",
@@ -237,7 +237,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         
         db = SessionLocal()
         try:
-            protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            protocol = db.get(Protocol, protocol_id)
             
             if not protocol:
                 return [TextContent(
@@ -317,7 +317,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         
         db = SessionLocal()
         try:
-            protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            protocol = db.get(Protocol, protocol_id)
             
             if not protocol:
                 return [TextContent(
@@ -359,7 +359,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         
         db = SessionLocal()
         try:
-            protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+            protocol = db.get(Protocol, protocol_id)
             
             if not protocol:
                 return [TextContent(
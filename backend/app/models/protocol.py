@@ -1,9 +1,11 @@
 """SQLAlchemy database models."""
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON, Float, Boolean
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Index, JSON, Float, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+import os
+import time
 import uuid
 
 
@@ -12,6 +14,24 @@ def generate_id():
     return str(uuid.uuid4())
 
 
+def generate_thread_id():
+    """Generate a time-ordered UUIDv7 string (RFC 9562 layout).
+
+    The stdlib has no uuid7 yet, so this builds one by hand: a 48-bit
+    millisecond timestamp followed by random bits. Time-ordered ids keep the
+    unique index on thread_id appending at the right edge instead of
+    fragmenting on random inserts.
+    """
+    ts_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")  # 80 bits, 74 used
+    value = (ts_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76  # version 7
+    value |= ((rand >> 62) & 0xFFF) << 64
+    value |= 0b10 << 62  # RFC 4122 variant
+    value |= rand & ((1 << 62) - 1)
+    return str(uuid.UUID(int=value))
+
+
 class User(Base):
     """User model for authentication."""
     __tablename__ = "users"
@@ -37,8 +57,12 @@ class Protocol(Base):
     intent = Column(String, nullable=False)
     protocol_type = Column(String, nullable=False)  # exposure_hierarchy, thought_record, etc.
     current_draft = Column(Text, nullable=False, default="")
-    status = Column(String, nullable=False, default="drafting")  # drafting, reviewing, awaiting_approval, approved, rejected
+    status = Column(String, nullable=False, default="drafting", index=True)  # drafting, reviewing, awaiting_approval, approved, rejected
     iteration_count = Column(Integer, default=0)
+
+    # Last routing decision, persisted so crash recovery resumes where the
+    # supervisor left off instead of recomputing from scores
+    next_agent = Column(String, nullable=True)
     
     # Safety metrics (stored as JSON)
     safety_score = Column(JSON, default=lambda: {"score": 0, "flags": [], "notes": ""})
@@ -46,8 +70,9 @@ class Protocol(Base):
     # Empathy metrics (stored as JSON)
     empathy_metrics = Column(JSON, default=lambda: {"score": 0, "tone": "", "suggestions": []})
     
-    # LangGraph checkpoint thread ID
-    thread_id = Column(String, unique=True, nullable=True)
+    # LangGraph checkpoint thread ID; time-ordered so the unique index stays
+    # append-friendly (the unique constraint already provides the index)
+    thread_id = Column(String, unique=True, nullable=True, default=generate_thread_id)
     
     # Approval metadata
     approved_at = Column(DateTime(timezone=True), nullable=True)
@@ -67,6 +92,13 @@ class Protocol(Base):
 class ProtocolVersion(Base):
     """Version history for protocols."""
     __tablename__ = "protocol_versions"
+    # Unique so version numbering is enforced at the DB layer, not just by the
+    # writers; also serves the per-protocol MAX(version) lookup in finalize.
+    # (No migration tooling in this repo: create_all builds it for new DBs,
+    # existing DBs need the index created by hand.)
+    __table_args__ = (
+        Index("ix_protocol_versions_pid_ver", "protocol_id", "version", unique=True),
+    )
     
     id = Column(String, primary_key=True, default=generate_id)
     protocol_id = Column(String, ForeignKey("protocols.id"), nullable=False)
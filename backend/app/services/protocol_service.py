@@ -1,4 +1,5 @@
 """Protocol business logic service."""
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.protocol import Protocol, AgentThought
 
@@ -48,7 +49,32 @@ class ProtocolService:
         ).count()
         
         return visit_count
-    
+
+    @staticmethod
+    def get_agent_visit_counts(db: Session, protocol_id: str, agent_roles: list) -> dict:
+        """Get visit counts for several agents in one grouped query.
+
+        Same counting rule as get_agent_visit_count (each visit starts with a
+        "thought" entry), but all requested roles come back in a single
+        round-trip instead of one count query per agent.
+
+        Args:
+            db: Database session
+            protocol_id: Protocol ID
+            agent_roles: Agent roles to count visits for
+
+        Returns:
+            Dict mapping each requested role to its visit count (0 if none)
+        """
+        rows = db.query(AgentThought.agent_role, func.count()).filter(
+            AgentThought.protocol_id == protocol_id,
+            AgentThought.agent_role.in_(agent_roles),
+            AgentThought.type == "thought"
+        ).group_by(AgentThought.agent_role).all()
+        counts = {role: 0 for role in agent_roles}
+        counts.update(dict(rows))
+        return counts
+
     @staticmethod
     def get_protocol(db: Session, protocol_id: str) -> Protocol:
         """Get protocol by ID.
@@ -63,7 +89,7 @@ class ProtocolService:
         Raises:
             ValueError: If protocol not found
         """
-        protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+        protocol = db.get(Protocol, protocol_id)
         if not protocol:
             raise ValueError(f"Protocol {protocol_id} not found")
         return protocol
@@ -1,4 +1,6 @@
 """Pydantic schemas for API requests and responses."""
+import json
+import re
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, EmailStr
@@ -106,7 +108,6 @@ class ProtocolResponse(BaseModel):
         # Normalize score - ensure it's an integer
         score = safety_score.get("score", 0)
         if isinstance(score, str):
-            import re
             numbers = re.findall(r'\d+', str(score))
             score = int(numbers[0]) if numbers else 0
         score = max(0, min(100, int(score)))  # Clamp to 0-100
@@ -123,7 +124,6 @@ class ProtocolResponse(BaseModel):
         notes = safety_score.get("notes", "")
         if isinstance(notes, dict):
             # If notes is a dict, convert it to a readable string
-            import json
             notes = json.dumps(notes, indent=2)
         elif not isinstance(notes, str):
             notes = str(notes) if notes else ""
@@ -0,0 +1,45 @@
+"""Heuristic complexity classification for incoming protocol requests.
+
+Simple, low-risk requests do not need the supervisor's LLM routing call on
+every pass — the deterministic routing ladder reaches the same decisions for
+them. Classifying once up front (no LLM, just a keyword/length check) lets the
+workflow skip those routing round-trips while leaving the safety guardian and
+clinical critic reviews untouched: review itself is never bypassed, only the
+LLM-assisted deliberation about what to run next.
+"""
+import re
+
+# Anything touching these topics is high-risk by definition and gets the full
+# LLM-reasoned routing treatment regardless of intent length
+_RISK_RE = re.compile(
+    r"suicid|self[\s-]?harm|crisis|abuse|trauma|ptsd|psychosis|overdose|"
+    r"medication|substance|addiction|eating disorder|grief|violence",
+    re.IGNORECASE,
+)
+
+# Intents longer than this are treated as complex: long intents tend to carry
+# nuanced constraints the keyword screen cannot judge
+_SIMPLE_INTENT_MAX_CHARS = 200
+
+
+def classify_intent_complexity(intent: str, protocol_type: str) -> str:
+    """Classify a protocol request as "simple" or "complex".
+
+    Pure keyword/length heuristic, no LLM call. Errs toward "complex": only
+    short intents with no risk-keyword match in either the intent or the
+    protocol type qualify as simple.
+
+    Args:
+        intent: The user's stated intent for the protocol
+        protocol_type: The requested protocol type
+
+    Returns:
+        "simple" or "complex"
+    """
+    intent = intent or ""
+    protocol_type = protocol_type or ""
+    if len(intent) >= _SIMPLE_INTENT_MAX_CHARS:
+        return "complex"
+    if _RISK_RE.search(intent) or _RISK_RE.search(protocol_type):
+        return "complex"
+    return "simple"
@@ -1,8 +1,16 @@
 """JSON parsing utilities."""
-import json
-import sys
+import logging
+import re
 from typing import Dict, Any
 
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Fenced-JSON extractor, compiled once: matches ```json ... ``` (or bare
+# ``` ... ```) blocks wrapping a JSON object
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
 
 def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> Dict[str, Any]:
     """Parse JSON from LLM response, handling markdown code blocks and truncated responses.
@@ -18,19 +26,13 @@ def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> D
         default = {}
     
     try:
-        # First, try to find JSON object in the response
-        # Look for JSON wrapped in markdown code blocks
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            if json_end > json_start:
-                response_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            if json_end > json_start:
-                response_text = response_text[json_start:json_end].strip()
-        
+        # First, try to find JSON wrapped in markdown code blocks. A response
+        # truncated inside an unclosed fence won't match and falls through to
+        # the brace matching below, which scans the raw text anyway.
+        fence_match = _FENCE_RE.search(response_text)
+        if fence_match:
+            response_text = fence_match.group(1)
+
         # Try to find JSON object boundaries if not in code block
         if "{" in response_text and "}" in response_text:
             start_idx = response_text.find("{")
@@ -68,7 +70,6 @@ def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> D
             if brace_count > 0:
                 # Response was truncated - try to close it properly
                 # Find the last complete field and close the object
-                import re
                 # Try to find the last complete key-value pair
                 # Look for patterns like "key": value or "key": "value"
                 last_comma = response_text.rfind(',', start_idx, end_idx if end_idx > start_idx else len(response_text))
@@ -98,7 +99,6 @@ def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> D
         response_text = response_text.strip()
         
         # Remove any trailing commas before closing braces/brackets
-        import re
         response_text = re.sub(r',\s*}', '}', response_text)
         response_text = re.sub(r',\s*]', ']', response_text)
         
@@ -123,15 +123,15 @@ def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> D
                                 break
                         response_text = response_text[:insert_pos] + '"' + response_text[insert_pos:]
         
-        return json.loads(response_text)
-    except (json.JSONDecodeError, ValueError) as e:
-        # Log the actual response for debugging
-        sys.stderr.write(f"JSON parsing failed. Response preview: {response_text[:1000]}\n")
-        sys.stderr.write(f"JSON parse error: {str(e)}\n")
+        # orjson: C-accelerated parse, same codec the DB JSON columns use
+        return orjson.loads(response_text)
+    except (orjson.JSONDecodeError, ValueError) as e:
+        # Log the actual response for debugging; lazy %s formatting skips the
+        # slicing/str-building entirely when the level is filtered out
+        logger.warning("JSON parsing failed (%s). Response preview: %.1000s", e, response_text)
         
         # Try one more time with a more aggressive fix
         try:
-            import re
             # Try to extract just the fields we need
             score_match = re.search(r'"score"\s*:\s*(\d+)', response_text)
             tone_match = re.search(r'"tone"\s*:\s*"([^"]*)', response_text)
@@ -154,7 +154,7 @@ def parse_json_response(response_text: str, default: Dict[str, Any] = None) -> D
                     "suggestions": suggestions if suggestions else ["Could not parse full response"]
                 }
         except Exception as e2:
-            sys.stderr.write(f"Fallback parsing also failed: {str(e2)}\n")
+            logger.warning("Fallback parsing also failed: %s", e2)
         
         return default
 
@@ -1,4 +1,5 @@
 """LLM provider utilities."""
+from functools import lru_cache
 from app.config import settings
 
 # Optional imports for LLM providers
@@ -39,8 +40,26 @@ except ImportError:
         pass
 
 
-def get_huggingface_llm():
-    """Get configured Hugging Face LLM instance (Qwen 2.5 Pro)."""
+# Generation parameters per workload. The drafter writes full protocols and
+# needs the large budget; reviewers (and the supervisor's routing call) emit a
+# short JSON verdict, so a small deterministic budget is enough - every unused
+# token slot still costs KV-cache on the inference server.
+_ROLE_PARAMS = {
+    "drafter": {"temperature": 0.7, "max_tokens": 32768},
+    "reviewer": {"temperature": 0.1, "max_tokens": 512},
+}
+
+
+@lru_cache(maxsize=None)
+def get_huggingface_llm(temperature: float = 0.7, max_tokens: int = 32768):
+    """Get configured Hugging Face LLM instance (Qwen 2.5 Pro).
+
+    Cached per process and per parameter set: every agent node calls
+    get_llm(), and constructing a fresh client per call rebuilds its HTTP
+    connection pool each time. The clients are thread-safe for invoke, so one
+    shared instance per role is fine. Failed construction is not cached
+    (lru_cache does not memoize exceptions).
+    """
     if not ChatHuggingFace:
         raise ValueError("langchain-community or langchain-huggingface not installed. Run: pip install langchain-community langchain-huggingface")
     
@@ -56,8 +75,8 @@ def get_huggingface_llm():
         llm = HuggingFaceEndpoint(
             repo_id=settings.HUGGINGFACE_MODEL,
             huggingfacehub_api_token=settings.HUGGINGFACE_API_KEY,
-            temperature=0.7,
-            max_new_tokens=32768,  # Increased limit for longer protocols
+            temperature=temperature,
+            max_new_tokens=max_tokens,
         )
         return ChatHuggingFace(llm=llm)
     else:
@@ -65,13 +84,19 @@ def get_huggingface_llm():
         return ChatHuggingFace(
             model=settings.HUGGINGFACE_MODEL,
             huggingfacehub_api_token=settings.HUGGINGFACE_API_KEY,
-            temperature=0.7,
-            max_tokens=32768,  # Increased limit for longer protocols
+            temperature=temperature,
+            max_tokens=max_tokens,
         )
 
 
-def get_mistral_llm():
-    """Get configured Mistral AI LLM instance."""
+@lru_cache(maxsize=None)
+def get_mistral_llm(temperature: float = 0.7, max_tokens: int = 32768):
+    """Get configured Mistral AI LLM instance.
+
+    Cached per process and per parameter set for the same reason as
+    get_huggingface_llm: reuse one client (and its HTTP connection pool)
+    across all node invocations.
+    """
     if not ChatMistralAI:
         raise ValueError(
             "langchain-mistralai not installed. Run: pip install langchain-mistralai mistralai"
@@ -83,12 +108,12 @@ def get_mistral_llm():
     return ChatMistralAI(
         model=settings.MISTRAL_MODEL,
         mistral_api_key=settings.MISTRAL_API_KEY,
-        temperature=0.7,
-        max_tokens=32768,  # Increased limit for longer protocols
+        temperature=temperature,
+        max_tokens=max_tokens,
     )
 
 
-def get_llm():
+def get_llm(role: str = "drafter"):
     """Get the configured LLM instance based on LLM_PROVIDER setting.
     
     Automatically switches between Hugging Face and Mistral based on:
@@ -99,13 +124,18 @@ def get_llm():
     1. Set LLM_PROVIDER=mistral in your environment or .env file
     2. Set MISTRAL_API_KEY=your-mistral-api-key
     3. Install: pip install langchain-mistralai mistralai
+    
+    Args:
+        role: "drafter" for full-budget generation, "reviewer" for the short
+            deterministic JSON verdicts the review/routing calls produce
     """
     provider = settings.LLM_PROVIDER.lower()
+    params = _ROLE_PARAMS.get(role, _ROLE_PARAMS["drafter"])
     
     if provider == "huggingface":
-        return get_huggingface_llm()
+        return get_huggingface_llm(**params)
     elif provider == "mistral":
-        return get_mistral_llm()
+        return get_mistral_llm(**params)
     else:
         raise ValueError(
             f"Unknown LLM_PROVIDER: {provider}. "
@@ -0,0 +1,66 @@
+"""In-process cache for LLM results keyed on salient input fields.
+
+Repeat protocol requests often carry the same (protocol_type, intent), and a
+draft that did not change between iterations produces the same review. Caching
+those results skips the whole LLM round-trip (seconds each). Keys are content
+hashes of the salient fields only — never agent_notes or iteration counters,
+which would fragment the key space without changing the answer.
+
+This is an exact-match cache: the repo has no Redis or embedding dependency,
+so near-duplicate intents ("panic attacks" vs "experiencing panic") miss. The
+key helper keeps that upgrade path open.
+"""
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.config import settings
+
+_cache: "OrderedDict[str, Any]" = OrderedDict()
+_lock = threading.Lock()
+
+# Hit/miss tallies so the cache's value can be checked from a shell or a
+# debug endpoint instead of guessed at
+_hits = 0
+_misses = 0
+
+
+def make_key(*parts: str) -> str:
+    """Hash the salient input fields into a cache key."""
+    raw = "\x1f".join(parts).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def get_cached(key: str) -> Optional[Any]:
+    """Return a copy of the cached value for key, or None on miss."""
+    global _hits, _misses
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    with _lock:
+        value = _cache.get(key)
+        if value is None:
+            _misses += 1
+            return None
+        _hits += 1
+        _cache.move_to_end(key)
+    # Copy so callers can mutate results without corrupting the cache
+    return copy.deepcopy(value)
+
+
+def set_cached(key: str, value: Any) -> None:
+    """Store a value, evicting least-recently-used entries beyond the cap."""
+    if not settings.LLM_CACHE_ENABLED:
+        return
+    with _lock:
+        _cache[key] = copy.deepcopy(value)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.LLM_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def stats() -> dict:
+    """Return hit/miss counters and current size for instrumentation."""
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "size": len(_cache)}
@@ -1,6 +1,6 @@
 """Helper utilities for protocol operations."""
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from app.models.protocol import Protocol, User
 
 
@@ -24,8 +24,15 @@ def get_protocol_or_404(
     Raises:
         HTTPException: If protocol not found or ownership check fails
     """
-    protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
-    
+    # Eager-load both collections in one round-trip each; ProtocolResponse
+    # serializes versions and agent_thoughts, which would otherwise lazy-load
+    protocol = (
+        db.query(Protocol)
+        .options(selectinload(Protocol.versions), selectinload(Protocol.agent_thoughts))
+        .filter(Protocol.id == protocol_id)
+        .first()
+    )
+
     if not protocol:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,9 +1,12 @@
 """Protocol state synchronization utilities."""
+import logging
 from typing import Dict, Any
 from sqlalchemy.orm import Session
 from app.agents.state import ProtocolState
 from app.models.protocol import Protocol
 
+logger = logging.getLogger(__name__)
+
 
 def sync_state_from_db(state: ProtocolState, db: Session) -> ProtocolState:
     """Sync state from database to ensure latest metrics and draft.
@@ -16,8 +19,11 @@ def sync_state_from_db(state: ProtocolState, db: Session) -> ProtocolState:
         Updated state with latest database values
     """
     protocol_id = state["protocol_id"]
-    db_protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
-    
+    # Primary-key lookup via the session identity map: within one workflow run
+    # the same session calls this repeatedly, so after the first SELECT the
+    # instance is served from memory until the next commit expires it
+    db_protocol = db.get(Protocol, protocol_id)
+
     if db_protocol:
         state["current_draft"] = db_protocol.current_draft or state.get("current_draft", "")
         state["safety_score"] = db_protocol.safety_score or state.get("safety_score", {"score": 0, "flags": [], "notes": ""})
@@ -39,9 +45,9 @@ def update_protocol_status(db: Session, protocol_id: str, new_status: str) -> No
         protocol_id: Protocol ID
         new_status: New status to set
     """
-    protocol = db.query(Protocol).filter(Protocol.id == protocol_id).first()
+    protocol = db.get(Protocol, protocol_id)
     if protocol and protocol.status != new_status:
         protocol.status = new_status
         db.commit()
-        print(f"Protocol {protocol_id} status updated to {new_status}")
+        logger.info("Protocol %s status updated to %s", protocol_id, new_status)
 
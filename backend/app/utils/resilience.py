@@ -0,0 +1,117 @@
+"""Retry and circuit-breaker wrappers for LLM endpoint calls.
+
+A transient 503 from the inference endpoint used to surface as a generic node
+failure, which the supervisor treats as "needs revision" — re-entering the
+workflow and re-invoking the LLM for another doomed attempt. The right
+primitive is a bounded retry with jittered exponential backoff for transient
+errors, plus a process-wide circuit breaker so a downed endpoint fails fast
+instead of burning an iteration (and a pool thread) per retry.
+
+tenacity is declared as a direct dependency in requirements.txt; the breaker
+is small enough to keep in-house rather than adding pybreaker.
+"""
+import logging
+import threading
+import time
+
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Substrings that mark an endpoint error as transient and worth retrying.
+# Mirrors the "503"/"unreachable_backend" special-casing the nodes already do.
+_TRANSIENT_MARKERS = (
+    "503", "502", "429", "timeout", "timed out",
+    "unreachable_backend", "overloaded", "connection",
+)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Minimal process-wide circuit breaker.
+
+    After fail_max consecutive failures the breaker opens and every call
+    raises CircuitOpenError immediately. After reset_timeout seconds the next
+    call is allowed through as a probe; success closes the breaker.
+    """
+
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 60.0):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _check(self) -> None:
+        with self._lock:
+            if self._failures < self.fail_max:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    "LLM endpoint circuit open after "
+                    f"{self._failures} consecutive failures"
+                )
+            # Half-open: let this call through as a probe
+
+    def _record(self, success: bool) -> None:
+        with self._lock:
+            if success:
+                self._failures = 0
+            else:
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    self._opened_at = time.monotonic()
+                    logger.warning(
+                        "LLM circuit breaker opened after %d failures; "
+                        "failing fast for %.0fs", self._failures, self.reset_timeout
+                    )
+
+    def call(self, fn, *args, **kwargs):
+        self._check()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(success=False)
+            raise
+        self._record(success=True)
+        return result
+
+
+# One breaker shared by every LLM-invoking node: a downed endpoint is a
+# process-level fact, not a per-node one
+llm_breaker = CircuitBreaker(fail_max=5, reset_timeout=60.0)
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=1, max=10),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+def _invoke_with_retry(runnable, prompt):
+    return llm_breaker.call(runnable.invoke, prompt)
+
+
+def invoke_resilient(runnable, prompt):
+    """Invoke a runnable with transient-error retries and the shared breaker.
+
+    Transient failures (5xx/429/timeouts) are retried up to 3 times with
+    jittered exponential backoff; everything else propagates on first failure.
+    While the breaker is open, raises CircuitOpenError without a network call.
+    """
+    return _invoke_with_retry(runnable, prompt)
@@ -0,0 +1,56 @@
+"""Tests for the database checkpointer's deferred flush."""
+import pytest
+from app.agents.checkpointer import DatabaseCheckpointer
+from app.models.protocol import Protocol, User
+
+
+def _make_protocol(db_session, status="reviewing"):
+    """Insert a minimal user + protocol row and return the protocol."""
+    user = User(id="test-user", name="Test User", email="test@example.com", hashed_password="x")
+    protocol = Protocol(
+        id="test-protocol", user_id=user.id, title="Test protocol",
+        intent="Test intent", protocol_type="thought_record", status=status,
+    )
+    db_session.add_all([user, protocol])
+    db_session.commit()
+    return protocol
+
+
+@pytest.mark.unit
+def test_flush_writes_buffered_fields(db_session):
+    """A deferred flush persists buffered state to an active protocol row."""
+    protocol = _make_protocol(db_session, status="drafting")
+    checkpointer = DatabaseCheckpointer(db_session, protocol.id)
+    checkpointer._pending = {"current_draft": "draft text", "status": "reviewing"}
+    checkpointer.flush()
+    db_session.expire_all()
+    assert protocol.current_draft == "draft text"
+    assert protocol.status == "reviewing"
+
+
+@pytest.mark.unit
+def test_flush_does_not_revert_terminal_status(db_session):
+    """A buffered non-terminal status must not overwrite a terminal one.
+
+    Regression: the runner's finally-block flush raced terminal statuses
+    committed elsewhere (reject API, recursion-limit handler) and reverted
+    the row to "reviewing", so startup resume re-spawned dead workflows.
+    """
+    protocol = _make_protocol(db_session, status="rejected")
+    checkpointer = DatabaseCheckpointer(db_session, protocol.id)
+    checkpointer._pending = {"current_draft": "stale draft", "status": "reviewing"}
+    checkpointer.flush()
+    db_session.expire_all()
+    assert protocol.status == "rejected"
+    assert protocol.current_draft != "stale draft"
+
+
+@pytest.mark.unit
+def test_flush_terminal_status_always_lands(db_session):
+    """A buffered terminal status is written regardless of the row's status."""
+    protocol = _make_protocol(db_session, status="reviewing")
+    checkpointer = DatabaseCheckpointer(db_session, protocol.id)
+    checkpointer._pending = {"status": "awaiting_approval"}
+    checkpointer.flush()
+    db_session.expire_all()
+    assert protocol.status == "awaiting_approval"